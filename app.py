@@ -1,15 +1,17 @@
 import os
 import logging
 import math
+import time
 from flask import Flask, render_template, request, flash, redirect, url_for, session, jsonify
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
-import pandas as pd
-from excel_processor import ExcelProcessor
-from arabic_search import ArabicSearchEngine
+from dataset_store import DatasetStore
+from data_watcher import DataFolderWatcher
+import threading
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
+_import_started = time.perf_counter()
 
 # Create Flask app
 app = Flask(__name__)
@@ -18,26 +20,181 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
-DATA_FOLDER = 'data'
+DATA_FOLDER = os.environ.get('DATA_FOLDER', 'data')
+CACHE_FOLDER = os.path.join(DATA_FOLDER, '.cache')
 ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
+DEFAULT_DATA_FILE = os.environ.get('DEFAULT_DATA_FILE', '')  # file in data/ loaded at startup
+DATA_WATCH_INTERVAL = float(os.environ.get('DATA_WATCH_INTERVAL', '30'))  # seconds, 0 disables
+COLUMN_INDEX_MEMORY_MB = int(os.environ.get('COLUMN_INDEX_MEMORY_MB', '128'))  # budget for on-demand column indexes
+DATASET_CACHE_MB = int(os.environ.get('DATASET_CACHE_MB', '1024'))  # disk budget for parsed datasets, schemas and reports in data/.cache
+DUPLICATE_REPORTS = os.environ.get('DUPLICATE_REPORTS', '1') != '0'  # background duplicate detection after loads
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['DATA_FOLDER'] = DATA_FOLDER
+app.config['CACHE_FOLDER'] = CACHE_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.config['DEFAULT_DATA_FILE'] = DEFAULT_DATA_FILE
+app.config['DATA_WATCH_INTERVAL'] = DATA_WATCH_INTERVAL
+app.config['COLUMN_INDEX_MEMORY_MB'] = COLUMN_INDEX_MEMORY_MB
+app.config['DATASET_CACHE_MB'] = DATASET_CACHE_MB
+app.config['DUPLICATE_REPORTS'] = DUPLICATE_REPORTS
 
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(DATA_FOLDER, exist_ok=True)
+os.makedirs(CACHE_FOLDER, exist_ok=True)
 
 # Global variables for data storage
-excel_processor = None
 search_engine = None
+active_content_hash = None
+dataset_store = DatasetStore(CACHE_FOLDER, max_disk_bytes=DATASET_CACHE_MB * 1024 * 1024)
+default_dataset = None
+data_watcher = None
+background_jobs_started = False
 
 def allowed_file(filename):
     """Check if file has allowed extension"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def load_dataset(filepath, content_hash, remember=True, report_duplicates=True):
+    """Return the parsed dataset for a file, reusing a prior parse of identical content
+    
+    Also called from the data folder watcher thread, so it must not touch the
+    globals of the active dataset.
+    """
+    from arabic_search import ArabicSearchEngine
+    
+    if remember:
+        dataset = dataset_store.get(content_hash)
+        if dataset is not None and dataset.get('index_version') == ArabicSearchEngine.INDEX_VERSION:
+            logging.info(f"Reusing parsed dataset {content_hash[:12]} for {filepath}")
+            if report_duplicates:
+                schedule_duplicate_report(content_hash, dataset['search_engine'])
+            return dataset
+    
+    # Ingestion dependencies (pandas readers, openpyxl, xlrd) are only imported
+    # by the process that actually parses a file
+    from excel_processor import ExcelProcessor
+    
+    # Process Excel file
+    processor = ExcelProcessor(cache_dir=app.config['CACHE_FOLDER'])
+    data, columns = processor.load_excel(filepath, content_hash)
+    
+    if data is None:
+        return None
+    
+    logging.info(f"Successfully loaded {len(data)} records with {len(columns)} columns")
+    
+    # Initialize search engine
+    logging.info("Initializing search engine...")
+    engine = ArabicSearchEngine(data, columns, schema=processor.schema,
+                                column_index_memory=app.config['COLUMN_INDEX_MEMORY_MB'] * 1024 * 1024)
+    logging.info("Search engine ready")
+    
+    dataset = {
+        'search_engine': engine,
+        'columns': columns,
+        'total_records': len(data),
+        'index_version': ArabicSearchEngine.INDEX_VERSION,
+    }
+    dataset_store.put(content_hash, dataset, remember=remember)
+    
+    if report_duplicates:
+        schedule_duplicate_report(content_hash, engine)
+    return dataset
+
+def schedule_duplicate_report(content_hash, engine):
+    """Run the duplicate detection job for a dataset in the background"""
+    if not app.config['DUPLICATE_REPORTS']:
+        return
+    
+    from duplicate_detection import write_report
+    
+    thread = threading.Thread(target=write_report, args=(app.config['CACHE_FOLDER'], content_hash, engine),
+                              name='duplicate-report', daemon=True)
+    thread.start()
+
+def preload_default_dataset():
+    """Load and index the configured default dataset
+    
+    Called at import time so that with gunicorn's preload_app the dataset is
+    built once in the master and shared copy-on-write by the forked workers.
+    """
+    global search_engine, default_dataset, active_content_hash
+    
+    filename = app.config['DEFAULT_DATA_FILE']
+    if not filename:
+        return
+    
+    filepath = os.path.join(app.config['DATA_FOLDER'], filename)
+    if not os.path.isfile(filepath) or not allowed_file(filename):
+        logging.warning(f"Default data file not found or not supported: {filepath}")
+        return
+    
+    try:
+        logging.info(f"Preloading default dataset: {filename}")
+        # No background jobs here: this runs in the gunicorn master before it forks
+        content_hash = dataset_store.hash_file(filepath)
+        dataset = load_dataset(filepath, content_hash, report_duplicates=False)
+        if dataset is None:
+            logging.error(f"Could not preload default dataset: {filename}")
+            return
+        search_engine = dataset['search_engine']
+        active_content_hash = content_hash
+        default_dataset = dict(dataset, filename=filename, content_hash=content_hash)
+        logging.info(f"Default dataset ready: {dataset['total_records']:,} records")
+    except Exception as e:
+        logging.error(f"Error preloading default dataset {filename}: {str(e)}")
+
+def prebuild_dataset(filepath):
+    """Parse and index a data file in the background so loading it later is instant"""
+    content_hash = dataset_store.hash_file(filepath)
+    if dataset_store.contains(content_hash):
+        return
+    logging.info(f"Pre-building indices for {filepath}")
+    # No duplicate report: that would start a process pool per file inside a serving worker
+    load_dataset(filepath, content_hash, remember=False, report_duplicates=False)
+
+def start_background_jobs():
+    """Start the per-host background work once the serving process is running
+    
+    Called from gunicorn's post_fork hook and, as a fallback for servers
+    started without gunicorn_config.py, before the first request.
+    """
+    global background_jobs_started
+    
+    if background_jobs_started:
+        return
+    background_jobs_started = True
+    
+    start_data_watcher()
+    if default_dataset:
+        schedule_duplicate_report(default_dataset['content_hash'], default_dataset['search_engine'])
+
+def start_data_watcher():
+    """Start the background watcher that pre-builds indices for files in data/"""
+    global data_watcher
+    
+    interval = app.config['DATA_WATCH_INTERVAL']
+    if interval <= 0 or data_watcher is not None:
+        return
+    
+    # Only one process per host runs the watcher; the lock is released when it exits
+    lock_file = open(os.path.join(app.config['CACHE_FOLDER'], 'watcher.lock'), 'w')
+    try:
+        import fcntl
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except ImportError:
+        pass
+    except OSError:
+        lock_file.close()
+        return
+    
+    data_watcher = DataFolderWatcher(app.config['DATA_FOLDER'], allowed_file, prebuild_dataset, interval)
+    data_watcher.lock_file = lock_file
+    data_watcher.start()
+
 def get_available_data_files():
     """Get list of Excel files from data directory"""
     data_files = []
@@ -68,10 +225,24 @@ def format_file_size(size_bytes):
     s = round(size_bytes / p, 2)
     return f"{s} {size_names[i]}"
 
+@app.before_request
+def ensure_background_jobs():
+    """Start background jobs in this process if no server hook has done so"""
+    if not background_jobs_started:
+        start_background_jobs()
+
 @app.route('/')
 def index():
     """Main page with file upload and search interface"""
     logging.info("Accessing main index page")
+    
+    # Sessions start on the preloaded default dataset until another file is loaded
+    if default_dataset and search_engine is default_dataset['search_engine'] and not session.get('has_data'):
+        session['has_data'] = True
+        session['columns'] = default_dataset['columns']
+        session['filename'] = default_dataset['filename']
+        session['total_records'] = default_dataset['total_records']
+    
     has_data = 'excel_data' in session or session.get('has_data', False)
     columns = session.get('columns', [])
     data_files = get_available_data_files()
@@ -89,7 +260,7 @@ def home():
 @app.route('/load_data_file', methods=['POST'])
 def load_data_file():
     """Load Excel file from data directory"""
-    global excel_processor, search_engine
+    global search_engine, active_content_hash
     
     filename = request.form.get('filename')
     if not filename:
@@ -112,35 +283,30 @@ def load_data_file():
     try:
         logging.info(f"Starting to process file: {filename} ({file_size_mb:.1f}MB)")
         
-        # Process Excel file
-        excel_processor = ExcelProcessor()
-        data, columns = excel_processor.load_excel(filepath)
+        content_hash = dataset_store.hash_file(filepath)
+        dataset = load_dataset(filepath, content_hash)
         
-        if data is None:
+        if dataset is None:
             flash('خطأ في معالجة ملف الإكسل', 'error')
             return redirect(url_for('index'))
         
-        logging.info(f"Successfully loaded {len(data)} records with {len(columns)} columns")
-        
-        # Initialize search engine
-        logging.info("Initializing search engine...")
-        search_engine = ArabicSearchEngine(data, columns)
-        logging.info("Search engine ready")
+        search_engine = dataset['search_engine']
+        active_content_hash = content_hash
         
         # Store in session
         session['has_data'] = True
-        session['columns'] = columns
+        session['columns'] = dataset['columns']
         session['filename'] = filename
-        session['total_records'] = len(data)
+        session['total_records'] = dataset['total_records']
         
-        flash(f'تم تحميل الملف بنجاح. عدد السجلات: {len(data):,}', 'success')
+        flash(f'تم تحميل الملف بنجاح. عدد السجلات: {dataset["total_records"]:,}', 'success')
         
     except Exception as e:
         logging.error(f"Error processing file {filename}: {str(e)}")
         flash(f'خطأ في معالجة الملف: {str(e)}', 'error')
         # Clear any partial data
-        excel_processor = None
         search_engine = None
+        active_content_hash = None
         session.pop('has_data', None)
     
     return redirect(url_for('index'))
@@ -148,7 +314,7 @@ def load_data_file():
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle Excel file upload and processing"""
-    global excel_processor, search_engine
+    global search_engine, active_content_hash
     
     if 'file' not in request.files:
         flash('لم يتم اختيار أي ملف', 'error')
@@ -161,37 +327,40 @@ def upload_file():
         return redirect(request.url)
     
     if file and file.filename and allowed_file(file.filename):
+        filepath = None
         try:
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            extension = file.filename.rsplit('.', 1)[1].lower()
             
-            # Process Excel file
-            excel_processor = ExcelProcessor()
-            data, columns = excel_processor.load_excel(filepath)
+            # Hash while streaming to disk so identical uploads reuse the prior parse
+            filepath, content_hash = dataset_store.save_upload(
+                file, app.config['UPLOAD_FOLDER'], extension)
+            dataset = load_dataset(filepath, content_hash)
             
-            if data is None:
+            if dataset is None:
                 flash('خطأ في معالجة ملف الإكسل', 'error')
                 return redirect(url_for('index'))
             
-            # Initialize search engine
-            search_engine = ArabicSearchEngine(data, columns)
+            search_engine = dataset['search_engine']
+            active_content_hash = content_hash
             
             # Store in session (for small datasets) or use file-based storage for large ones
             session['has_data'] = True
-            session['columns'] = columns
+            session['columns'] = dataset['columns']
             session['filename'] = filename
-            session['total_records'] = len(data)
+            session['total_records'] = dataset['total_records']
             
-            flash(f'تم رفع الملف بنجاح. عدد السجلات: {len(data):,}', 'success')
-            
-            # Clean up uploaded file to save space
-            os.remove(filepath)
+            flash(f'تم رفع الملف بنجاح. عدد السجلات: {dataset["total_records"]:,}', 'success')
             
         except Exception as e:
             logging.error(f"Error processing file: {str(e)}")
             flash(f'خطأ في معالجة الملف: {str(e)}', 'error')
         
+        finally:
+            # Clean up uploaded file to save space
+            if filepath and os.path.exists(filepath):
+                os.remove(filepath)
+        
         return redirect(url_for('index'))
     
     flash('نوع الملف غير مدعوم. يرجى رفع ملف Excel (.xlsx أو .xls)', 'error')
@@ -207,6 +376,7 @@ def search():
         return redirect(url_for('index'))
     
     search_type = request.form.get('search_type', 'name')
+    search_column = request.form.get('column', '')
     query = request.form.get('query', '').strip()
     page = int(request.form.get('page', 1))
     per_page = 50  # Results per page
@@ -215,13 +385,26 @@ def search():
         flash('يرجى إدخال نص البحث', 'error')
         return redirect(url_for('index'))
     
+    corrected_query = None
+    suggestions = []
+    
     try:
         if search_type == 'id':
             # Search by رقم الجلوس (ID)
             results = search_engine.search_by_id(query)
+        elif search_type == 'column':
+            # Search any other column (school, national ID, mother's name...)
+            results = search_engine.search_by_column(search_column, query)
         else:
             # Search by الاسم (name) with fuzzy matching
             results = search_engine.search_by_name(query)
+            
+            # Tell the user when typos were corrected, offer alternatives when nothing matched
+            corrected = search_engine.correct_query(query)
+            if corrected != search_engine._normalize_for_search(query):
+                corrected_query = corrected
+            if not results:
+                suggestions = search_engine.suggest_names(query)
         
         # Pagination
         total_results = len(results)
@@ -238,11 +421,14 @@ def search():
                              results=paginated_results,
                              query=query,
                              search_type=search_type,
+                             search_column=search_column,
                              total_results=total_results,
                              page=page,
                              total_pages=total_pages,
                              has_prev=has_prev,
                              has_next=has_next,
+                             corrected_query=corrected_query,
+                             suggestions=suggestions,
                              columns=session.get('columns', []))
     
     except Exception as e:
@@ -250,13 +436,79 @@ def search():
         flash(f'خطأ في البحث: {str(e)}', 'error')
         return redirect(url_for('index'))
 
+@app.route('/api/top')
+def api_top():
+    """Top students by a numeric column, nationally or within one school/region"""
+    if not search_engine:
+        return jsonify({'error': 'لا توجد بيانات محملة'}), 400
+    
+    column = request.args.get('column', '')
+    facet_column = request.args.get('facet_column') or None
+    facet_value = request.args.get('facet_value') or None
+    try:
+        n = min(max(int(request.args.get('n', 100)), 1), 1000)
+    except ValueError:
+        return jsonify({'error': 'قيمة n غير صحيحة'}), 400
+    
+    if column not in search_engine.rank_views:
+        return jsonify({'error': 'العمود غير رقمي أو غير موجود',
+                        'rank_columns': list(search_engine.rank_views.views),
+                        'facet_columns': search_engine.rank_views.facet_columns}), 400
+    
+    results = search_engine.top_students(column, n, facet_column, facet_value)
+    return jsonify({'column': column, 'facet_column': facet_column, 'facet_value': facet_value,
+                    'results': results})
+
+@app.route('/api/rank')
+def api_rank():
+    """Rank and percentile of a student (by seat number) in a numeric column"""
+    if not search_engine:
+        return jsonify({'error': 'لا توجد بيانات محملة'}), 400
+    
+    seat_number = request.args.get('seat', '').strip()
+    column = request.args.get('column', '')
+    
+    if column not in search_engine.rank_views:
+        return jsonify({'error': 'العمود غير رقمي أو غير موجود',
+                        'rank_columns': list(search_engine.rank_views.views)}), 400
+    
+    result = search_engine.student_rank(seat_number, column)
+    if result is None:
+        return jsonify({'error': 'لم يتم العثور على الطالب أو لا توجد درجة'}), 404
+    return jsonify(result)
+
+@app.route('/api/duplicates')
+def api_duplicates():
+    """Duplicate seat numbers and likely duplicate name clusters in the active dataset"""
+    if not search_engine or not active_content_hash:
+        return jsonify({'error': 'لا توجد بيانات محملة'}), 400
+    
+    from duplicate_detection import load_report, report_status
+    
+    report = load_report(app.config['CACHE_FOLDER'], active_content_hash)
+    if report is None:
+        if not app.config['DUPLICATE_REPORTS']:
+            return jsonify({'error': 'تقرير التكرارات غير مفعل'}), 404
+        status = report_status(app.config['CACHE_FOLDER'], active_content_hash)
+        if status['status'] == 'failed':
+            return jsonify(status), 500
+        if status['status'] == 'missing':
+            # Never scheduled, or its process died: start it now
+            schedule_duplicate_report(active_content_hash, search_engine)
+        return jsonify({'status': 'running'}), 202
+    
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify(dict(report,
+                        duplicate_ids=report['duplicate_ids'][:limit],
+                        name_clusters=report['name_clusters'][:limit]))
+
 @app.route('/clear_data')
 def clear_data():
     """Clear uploaded data and reset session"""
-    global excel_processor, search_engine
+    global search_engine, active_content_hash
     
-    excel_processor = None
     search_engine = None
+    active_content_hash = None
     
     # Clear session data
     keys_to_remove = ['has_data', 'columns', 'filename', 'total_records']
@@ -284,5 +536,12 @@ def internal_error(e):
     flash('حدث خطأ داخلي في النظام', 'error')
     return render_template('index.html'), 500
 
+# The duplicate job's spawn pool re-imports the entry module as __mp_main__;
+# its processes only compare names and must not load the dataset again
+if __name__ != '__mp_main__':
+    preload_default_dataset()
+logging.info(f"App initialized in {time.perf_counter() - _import_started:.2f}s")
+
 if __name__ == '__main__':
+    start_background_jobs()
     app.run(host='0.0.0.0', port=5000, debug=True)
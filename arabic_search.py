@@ -1,23 +1,54 @@
 import pandas as pd
+import numpy as np
 import re
-from typing import List, Dict, Any
+import heapq
+from typing import List, Dict, Any, Optional
 import logging
 from difflib import SequenceMatcher
+from compact_index import CompactIndex
+from spell_correction import SpellCorrector
+from phonetic import PhoneticIndex, contains_latin
+from column_index import ColumnIndexManager
+from rank_views import RankViews
 
 class ArabicSearchEngine:
     """Search engine for Arabic text with fuzzy matching capabilities"""
     
-    def __init__(self, data: pd.DataFrame, columns: List[str]):
+    # Bumped whenever the pickled index layout changes, so cached datasets are rebuilt
+    INDEX_VERSION = 12
+    
+    def __init__(self, data: pd.DataFrame, columns: List[str], schema: Optional[dict] = None,
+                 column_index_memory: int = 128 * 1024 * 1024):
         self.data = data
         self.columns = columns
+        self.schema = schema
         self.name_column = None
         self.id_column = None
         
-        # Try to identify name and ID columns
-        self._identify_columns()
+        # Decimal columns written with a fixed number of decimals keep it on display
+        self.decimals = {}
+        if schema:
+            for col, spec in schema['columns'].items():
+                if spec.get('decimals') is not None:
+                    self.decimals[col] = spec['decimals']
+        
+        # Use the roles inferred by the loader, otherwise guess them here
+        if schema and schema.get('roles'):
+            self.name_column = schema['roles'].get('name')
+            self.id_column = schema['roles'].get('id')
+            logging.info(f"Using schema columns: name={self.name_column}, id={self.id_column}")
+        else:
+            self._identify_columns()
         
         # Create search indices for better performance
         self._create_indices()
+        
+        # Any other column gets its own index the first time it is searched
+        self.column_indexes = ColumnIndexManager(self._column_as_text, self._normalize_for_search,
+                                                 max_bytes=column_index_memory)
+        
+        # Sorted views of the grade columns for top-N, rank and percentile queries
+        self.rank_views = RankViews(self.data, exclude=[self.id_column])
     
     def _identify_columns(self):
         """Identify which columns contain names and IDs"""
@@ -72,12 +103,12 @@ class ArabicSearchEngine:
         if self.name_column:
             # Create normalized name index with progress logging
             logging.info(f"Indexing name column: {self.name_column}")
-            for idx in range(len(self.data)):
+            names = self._column_as_text(self.name_column)
+            for idx, name in enumerate(names):
                 if idx % 10000 == 0 and idx > 0:
                     logging.info(f"Processed {idx} names...")
                 
                 try:
-                    name = str(self.data.iloc[idx][self.name_column])
                     normalized_name = self._normalize_for_search(name)
                     if normalized_name:
                         if normalized_name not in self.name_index:
@@ -90,12 +121,13 @@ class ArabicSearchEngine:
         if self.id_column:
             # Create ID index with progress logging
             logging.info(f"Indexing ID column: {self.id_column}")
-            for idx in range(len(self.data)):
+            id_values = self._column_as_text(self.id_column)
+            for idx, id_val in enumerate(id_values):
                 if idx % 10000 == 0 and idx > 0:
                     logging.info(f"Processed {idx} IDs...")
                 
                 try:
-                    id_val = str(self.data.iloc[idx][self.id_column]).strip()
+                    id_val = id_val.strip()
                     if id_val and id_val != 'nan' and id_val != '':
                         if id_val not in self.id_index:
                             self.id_index[id_val] = []
@@ -104,7 +136,47 @@ class ArabicSearchEngine:
                     logging.warning(f"Error processing ID at index {idx}: {e}")
                     continue
         
-        logging.info(f"Indexing complete. Names: {len(self.name_index)}, IDs: {len(self.id_index)}")
+        # Freeze the indices into flat buffers so forked workers keep sharing them
+        self.name_index = CompactIndex.from_dict(self.name_index)
+        self.id_index = CompactIndex.from_dict(self.id_index)
+        
+        logging.info(f"Indexing complete. Names: {len(self.name_index)}, IDs: {len(self.id_index)}, "
+                     f"index memory: {(self.name_index.nbytes + self.id_index.nbytes) / 1048576:.1f}MB")
+        
+        # Typo correction dictionary over all words that appear in names
+        self.spell_corrector = SpellCorrector(self.name_index)
+        
+        # Phonetic keys for Latin-script and sound-alike queries
+        self.phonetic_index = PhoneticIndex(self.name_index)
+    
+    def _column_as_text(self, column: str) -> List[str]:
+        """Return a column of any dtype as plain strings, with missing values as empty strings"""
+        series = self.data[column]
+        if pd.api.types.is_float_dtype(series.dtype):
+            # to_numpy keeps float32 scalars, so they print at their own precision
+            return [self._format_value(value, column) for value in series.to_numpy()]
+        return series.astype('string').fillna('').tolist()
+    
+    def _format_value(self, value, column: Optional[str] = None):
+        """Format a typed cell for display the way it appeared in the source file"""
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return ''
+        if isinstance(value, (float, np.floating)):
+            if column in self.decimals:
+                return f"{float(value):.{self.decimals[column]}f}"
+            # Shortest text that reads back as the same value ("97.333", "97.5")
+            return np.format_float_positional(value, trim='-')
+        if isinstance(value, np.integer):
+            return int(value)
+        return value
+    
+    def _row_to_dict(self, idx: int) -> Dict[str, Any]:
+        """Build a result row for display from the typed DataFrame"""
+        row = self.data.iloc[idx]
+        if row.dtype != object:
+            # An all-numeric row is upcast (float32 grades to float64), so read it per column
+            return {col: self._format_value(self.data[col].iat[idx], col) for col in self.data.columns}
+        return {col: self._format_value(value, col) for col, value in row.items()}
     
     def _contains_arabic(self, text: str) -> bool:
         """Check if text contains Arabic characters"""
@@ -202,6 +274,55 @@ class ArabicSearchEngine:
         
         return compound_similarity
     
+    def search_by_column(self, column: str, query: str) -> List[Dict[str, Any]]:
+        """Search any column by exact value, or by rows containing every query word"""
+        results = []
+        
+        if column not in self.data.columns:
+            logging.warning(f"Unknown search column: {column}")
+            return results
+        
+        normalized_query = self._normalize_for_search(query)
+        if not normalized_query:
+            return results
+        
+        index = self.column_indexes.get(column)
+        if index is not None:
+            rows, match_type = index.lookup(normalized_query)
+            rows = rows[:100].tolist()
+        else:
+            # Index build failed or is unusually slow, answer this query with a scan
+            rows, match_type = self._scan_column(column, normalized_query)
+        
+        for idx in rows:
+            row = self._row_to_dict(idx)
+            row['_match_type'] = match_type
+            row['_similarity'] = 1.0 if match_type == 'exact' else 0.8
+            results.append(row)
+        
+        return results
+    
+    def _scan_column(self, column: str, normalized_query: str, limit: int = 100):
+        """Linear scan with the same matching rules as ColumnIndex.lookup"""
+        query_words = set(normalized_query.split())
+        exact_rows = []
+        partial_rows = []
+        
+        for idx, value in enumerate(self._column_as_text(column)):
+            normalized = self._normalize_for_search(value)
+            if not normalized:
+                continue
+            if normalized == normalized_query:
+                exact_rows.append(idx)
+                if len(exact_rows) >= limit:
+                    break
+            elif len(partial_rows) < limit and query_words.issubset(normalized.split()):
+                partial_rows.append(idx)
+        
+        if exact_rows:
+            return exact_rows, 'exact'
+        return partial_rows, 'partial'
+    
     def search_by_id(self, query: str) -> List[Dict[str, Any]]:
         """Search by ID number (رقم الجلوس)"""
         results = []
@@ -215,20 +336,28 @@ class ArabicSearchEngine:
         # Try exact match first
         if query in self.id_index:
             for idx in self.id_index[query]:
-                row = self.data.iloc[idx].to_dict()
+                row = self._row_to_dict(idx)
                 row['_match_type'] = 'exact'
                 row['_similarity'] = 1.0
                 results.append(row)
         
         # If no exact match, try partial matches
         if not results:
-            for id_val in self.id_index:
-                if query in id_val or id_val in query:
-                    for idx in self.id_index[id_val]:
-                        row = self.data.iloc[idx].to_dict()
-                        row['_match_type'] = 'partial'
-                        row['_similarity'] = 0.8
-                        results.append(row)
+            # Seat numbers containing the query, merged in key order with those the query contains
+            positions = heapq.merge(self.id_index.positions_containing(query),
+                                    self.id_index.positions_within(query))
+            previous = None
+            for position in positions:
+                if position == previous:
+                    continue
+                previous = position
+                for idx in self.id_index.rows_at(position).tolist():
+                    row = self._row_to_dict(idx)
+                    row['_match_type'] = 'partial'
+                    row['_similarity'] = 0.8
+                    results.append(row)
+                if len(results) >= 100:
+                    break  # rows past the limit would be built only to be dropped
         
         return results[:100]  # Limit results
     
@@ -245,26 +374,42 @@ class ArabicSearchEngine:
         if not normalized_query:
             return results
         
-        # Split query into words for compound name matching
-        query_words = normalized_query.split()
-        
         # Collect all potential matches with similarity scores
-        candidates = []
-        
-        # Search through the name index
-        for name in self.name_index:
-            similarity = self._calculate_compound_similarity(query_words, name)
+        candidates = {}
+        
+        if contains_latin(normalized_query):
+            # Latin-script names can only match through the phonetic index
+            query_words = None
+        else:
+            # Split query into words for compound name matching, rewriting typos to known words
+            # (words that are part of a known word are kept, they may be a typed prefix)
+            query_words = self.spell_corrector.correct(normalized_query.split())
             
-            if similarity >= 0.3:  # Lower threshold for compound matching
-                for idx in self.name_index[name]:
-                    candidates.append((idx, similarity, name))
+            # Search through the name index
+            for name, rows in self.name_index.items():
+                similarity = self._calculate_compound_similarity(query_words, name)
+                
+                if similarity >= 0.3:  # Lower threshold for compound matching
+                    for idx in rows:
+                        candidates[idx] = (similarity, name)
+        
+        # Add names that sound like the query (dialect spellings, transliterations)
+        phonetic_query = ' '.join(query_words) if query_words else normalized_query
+        for position, similarity in self.phonetic_index.search(phonetic_query):
+            if similarity < 0.3:
+                break  # results are sorted best first
+            name = self.name_index.key_at(position)
+            for idx in self.name_index.rows_at(position).tolist():
+                if idx not in candidates or candidates[idx][0] < similarity:
+                    candidates[idx] = (similarity, name)
         
         # Sort by similarity (descending)
-        candidates.sort(key=lambda x: x[1], reverse=True)
+        candidates = sorted(((idx, similarity, name) for idx, (similarity, name) in candidates.items()),
+                            key=lambda x: x[1], reverse=True)
         
         # Convert to result format
         for idx, similarity, matched_name in candidates[:100]:  # Limit to 100 results
-            row = self.data.iloc[idx].to_dict()
+            row = self._row_to_dict(idx)
             row['_match_type'] = 'fuzzy' if similarity < 1.0 else 'exact'
             row['_similarity'] = similarity
             row['_matched_name'] = matched_name
@@ -272,6 +417,68 @@ class ArabicSearchEngine:
         
         return results
     
+    def top_students(self, column: str, n: int = 100, facet_column: Optional[str] = None,
+                     facet_value: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Students with the highest values in a numeric column, nationally or for one facet value"""
+        results = []
+        
+        if column not in self.rank_views:
+            logging.warning(f"No rank view for column: {column}")
+            return results
+        if facet_column is not None and facet_column not in self.rank_views.facet_columns:
+            logging.warning(f"Not a facet column: {facet_column}")
+            return results
+        
+        view = self.rank_views[column]
+        for idx in view.top(n, facet_column, facet_value).tolist():
+            row = self._row_to_dict(idx)
+            row['_rank'] = view.rank(float(self.data[column].iat[idx]), facet_column, idx)['rank']
+            results.append(row)
+        
+        return results
+    
+    def student_rank(self, seat_number: str, column: str) -> Optional[Dict[str, Any]]:
+        """Rank and percentile of a student in a numeric column, nationally and per facet"""
+        if column not in self.rank_views or not self.id_column:
+            return None
+        
+        rows = self.id_index.get(str(seat_number).strip())
+        if rows is None or len(rows) == 0:
+            return None
+        
+        idx = int(rows[0])
+        value = self.data[column].iat[idx]
+        if pd.isna(value):
+            return None
+        
+        view = self.rank_views[column]
+        result = {
+            'seat_number': str(seat_number).strip(),
+            'column': column,
+            'value': self._format_value(value, column),
+            'national': view.rank(float(value)),
+            'facets': {},
+        }
+        for facet_column in self.rank_views.facet_columns:
+            facet_value = self.data[facet_column].iat[idx]
+            if pd.isna(facet_value):
+                continue
+            result['facets'][facet_column] = dict(view.rank(float(value), facet_column, idx),
+                                                  value=str(facet_value))
+        return result
+    
+    def correct_query(self, query: str) -> str:
+        """Normalized query with every word rewritten to its closest known name word"""
+        words = self._normalize_for_search(query).split()
+        return ' '.join(self.spell_corrector.correct(words))
+    
+    def suggest_names(self, query: str, limit: int = 3) -> List[str]:
+        """'Did you mean' alternatives for a name query"""
+        words = self._normalize_for_search(query).split()
+        if not words:
+            return []
+        return self.spell_corrector.suggest(words, limit=limit)
+    
     def get_column_info(self) -> Dict[str, Any]:
         """Get information about detected columns"""
         return {
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from compact_index import CompactIndex
+
+
+class ColumnIndex:
+    """Exact-value and token indexes over one column, both as CompactIndex buffers"""
+
+    def __init__(self, column: str, values: List[str], normalize: Callable[[str], str]):
+        self.column = column
+
+        exact = {}
+        for idx, value in enumerate(values):
+            normalized = normalize(value)
+            if normalized:
+                exact.setdefault(normalized, []).append(idx)
+
+        tokens = {}
+        for normalized, rows in exact.items():
+            for token in set(normalized.split()):
+                tokens.setdefault(token, []).extend(rows)
+
+        self.exact = CompactIndex.from_dict(exact)
+        self.tokens = CompactIndex.from_dict(tokens)
+
+    @property
+    def nbytes(self) -> int:
+        return self.exact.nbytes + self.tokens.nbytes
+
+    def lookup(self, normalized_query: str) -> Tuple[np.ndarray, str]:
+        """Rows whose value equals the query, else rows containing every query word"""
+        rows = self.exact.get(normalized_query)
+        if rows is not None:
+            return rows, 'exact'
+
+        matched = None
+        for token in set(normalized_query.split()):
+            token_rows = self.tokens.get(token)
+            if token_rows is None:
+                return np.empty(0, dtype=np.int32), 'partial'
+            matched = token_rows if matched is None else np.intersect1d(matched, token_rows)
+        if matched is None:
+            matched = np.empty(0, dtype=np.int32)
+        return np.sort(matched), 'partial'
+
+
+class ColumnIndexManager:
+    """Builds per-column indexes on first use and evicts the least used
+
+    Only columns people actually search are indexed. The first query on a
+    column waits for its index instead of scanning, and concurrent queries
+    wait for the same build, so the column is normalized only once. When the
+    indexes together exceed `max_bytes`, the least recently used ones are
+    dropped and will be rebuilt if that column is searched again.
+    """
+
+    def __init__(self, column_values: Callable[[str], List[str]], normalize: Callable[[str], str],
+                 max_bytes: int = 128 * 1024 * 1024):
+        self.column_values = column_values
+        self.normalize = normalize
+        self.max_bytes = max_bytes
+        self._reset()
+
+    def _reset(self):
+        self._indexes = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        # Created on first use so that no thread exists before gunicorn forks workers
+        self._executor = None
+
+    def __getstate__(self):
+        # Indexes and threads are per process; a cached dataset starts with none
+        state = self.__dict__.copy()
+        for key in ('_indexes', '_building', '_lock', '_executor'):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def get(self, column: str, timeout: float = 120.0) -> Optional[ColumnIndex]:
+        """Return the index for a column, building it first if needed
+
+        Returns None if the build failed or takes longer than `timeout`; the
+        build carries on and later queries will use it.
+        """
+        with self._lock:
+            index = self._indexes.get(column)
+            if index is not None:
+                self._indexes.move_to_end(column)
+                return index
+
+            future = self._building.get(column)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='column-index')
+                future = self._executor.submit(self._build, column)
+                self._building[column] = future
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return None
+
+    def _build(self, column: str) -> Optional[ColumnIndex]:
+        started = time.perf_counter()
+        try:
+            index = ColumnIndex(column, self.column_values(column), self.normalize)
+        except Exception as e:
+            logging.error(f"Error indexing column {column}: {e}")
+            with self._lock:
+                self._building.pop(column, None)
+            return None
+
+        with self._lock:
+            self._building.pop(column, None)
+            self._indexes[column] = index
+            self._evict()
+
+        logging.info(f"Indexed column {column} in {time.perf_counter() - started:.2f}s "
+                     f"({index.nbytes / 1048576:.1f}MB)")
+        return index
+
+    def _evict(self):
+        """Drop least recently used indexes until the total fits the memory budget"""
+        total = sum(index.nbytes for index in self._indexes.values())
+        while total > self.max_bytes and len(self._indexes) > 1:
+            column, index = self._indexes.popitem(last=False)
+            total -= index.nbytes
+            logging.info(f"Evicted index for column {column} ({index.nbytes / 1048576:.1f}MB)")
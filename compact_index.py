@@ -0,0 +1,132 @@
+import numpy as np
+from typing import Dict, Iterator, List, Optional
+
+
+class CompactIndex:
+    """Read-only mapping of string keys to row numbers stored in a few flat numpy buffers
+
+    A dict of lists holds one Python object per key and per row number, and
+    every search or garbage collection pass touches their reference counts,
+    which un-shares the copy-on-write pages of preloaded gunicorn workers.
+    Here the sorted keys are kept as one UTF-8 blob with an offsets array and
+    the row numbers as one int32 array, so the whole index is a handful of objects.
+
+    The interface follows the dict it replaces: ``key in index``,
+    ``index[key]``, ``index.get(key)``, ``len(index)`` and iteration over keys.
+    """
+
+    def __init__(self, blob: np.ndarray, key_offsets: np.ndarray,
+                 row_offsets: np.ndarray, row_ids: np.ndarray):
+        self._blob = blob
+        self._key_offsets = key_offsets
+        self._row_offsets = row_offsets
+        self._row_ids = row_ids
+        # No text longer than this (in characters) can equal a key
+        self._max_key_length = int(np.diff(key_offsets).max()) if len(key_offsets) > 1 else 0
+
+    @classmethod
+    def from_dict(cls, mapping: Dict[str, List[int]]) -> 'CompactIndex':
+        """Build an index from a key -> row numbers dict"""
+        encoded = sorted((key.encode('utf-8'), rows) for key, rows in mapping.items())
+
+        key_lengths = np.fromiter((len(key) for key, _ in encoded), dtype=np.int64, count=len(encoded))
+        row_counts = np.fromiter((len(rows) for _, rows in encoded), dtype=np.int64, count=len(encoded))
+
+        key_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(key_lengths, out=key_offsets[1:])
+        row_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(row_counts, out=row_offsets[1:])
+
+        blob = np.frombuffer(b''.join(key for key, _ in encoded), dtype=np.uint8).copy()
+        row_ids = np.fromiter((row for _, rows in encoded for row in rows),
+                              dtype=np.int32, count=int(row_offsets[-1]))
+
+        return cls(blob, key_offsets, row_offsets, row_ids)
+
+    def _key_bytes(self, position: int) -> bytes:
+        start, end = self._key_offsets[position], self._key_offsets[position + 1]
+        return self._blob[start:end].tobytes()
+
+    def _find(self, key: str) -> int:
+        """Binary search for a key, returning its position or -1"""
+        target = key.encode('utf-8')
+        low, high = 0, len(self._key_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_bytes(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._key_offsets) - 1 and self._key_bytes(low) == target:
+            return low
+        return -1
+
+    def positions_containing(self, text: str) -> Iterator[int]:
+        """Positions of keys containing text, in key order, found by searching the blob directly"""
+        target = text.encode('utf-8')
+        if not target:
+            return
+        blob = self._blob.tobytes()
+        offsets = self._key_offsets
+        start = blob.find(target)
+        while start >= 0:
+            position = int(np.searchsorted(offsets, start, side='right')) - 1
+            key_end = int(offsets[position + 1])
+            if start + len(target) <= key_end:
+                yield position
+                start = blob.find(target, key_end)
+            else:
+                # The hit spans two keys; look again from inside the next key
+                start = blob.find(target, start + 1)
+
+    def positions_within(self, text: str) -> List[int]:
+        """Positions of keys that are substrings of text, in key order"""
+        positions = {self._find(text[i:j]) for i in range(len(text))
+                     for j in range(i + 1, min(i + self._max_key_length, len(text)) + 1)}
+        positions.discard(-1)
+        return sorted(positions)
+
+    def key_at(self, position: int) -> str:
+        """Key stored at a position in sorted order"""
+        return self._key_bytes(position).decode('utf-8')
+
+    def rows_at(self, position: int) -> np.ndarray:
+        """Row numbers stored for the key at a position"""
+        return self._row_ids[self._row_offsets[position]:self._row_offsets[position + 1]]
+
+    def get(self, key: str, default=None) -> Optional[np.ndarray]:
+        position = self._find(key)
+        if position < 0:
+            return default
+        return self.rows_at(position)
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        rows = self.get(key)
+        if rows is None:
+            raise KeyError(key)
+        return rows
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self._key_offsets) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        blob = memoryview(self._blob)
+        offsets = self._key_offsets.tolist()
+        for position in range(len(offsets) - 1):
+            yield str(blob[offsets[position]:offsets[position + 1]], 'utf-8')
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def items(self) -> Iterator:
+        for position, key in enumerate(self):
+            yield key, self.rows_at(position)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index buffers"""
+        return (self._blob.nbytes + self._key_offsets.nbytes +
+                self._row_offsets.nbytes + self._row_ids.nbytes)
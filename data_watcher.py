@@ -0,0 +1,84 @@
+import logging
+import os
+import threading
+from typing import Callable, Dict, Tuple
+
+
+class DataFolderWatcher:
+    """Poll the data folder and report new or changed files in a background thread
+
+    Polling keeps this free of extra dependencies and works on shared hosting
+    where inotify is not available. A file is reported once its size and
+    modification time have stopped changing between two scans, so files that
+    are still being copied into the folder are not picked up half-written.
+    """
+
+    def __init__(self, folder: str, is_allowed: Callable[[str], bool],
+                 on_change: Callable[[str], None], interval: float = 30.0):
+        self.folder = folder
+        self.is_allowed = is_allowed
+        self.on_change = on_change
+        self.interval = interval
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        self._pending: Dict[str, Tuple[int, int]] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='data-folder-watcher', daemon=True)
+        self._thread.start()
+        logging.info(f"Watching {self.folder} for new data files every {self.interval:g}s")
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                logging.error(f"Data folder scan failed: {e}")
+            self._stop.wait(self.interval)
+
+    def scan(self):
+        """Check the folder once and call on_change for every settled new or changed file"""
+        if not os.path.isdir(self.folder):
+            return
+
+        current = {}
+        for filename in os.listdir(self.folder):
+            filepath = os.path.join(self.folder, filename)
+            if not self.is_allowed(filename) or not os.path.isfile(filepath):
+                continue
+            stat = os.stat(filepath)
+            current[filepath] = (stat.st_size, stat.st_mtime_ns)
+
+        for filepath, signature in current.items():
+            if self._seen.get(filepath) == signature:
+                continue
+            if self._pending.get(filepath) != signature:
+                # Wait one more scan to make sure the file is no longer being written
+                self._pending[filepath] = signature
+                continue
+
+            del self._pending[filepath]
+            self._seen[filepath] = signature
+            logging.info(f"New or changed data file: {filepath}")
+            try:
+                self.on_change(filepath)
+            except Exception as e:
+                logging.error(f"Error preparing {filepath}: {e}")
+
+        # Forget files that were removed
+        for filepath in list(self._seen):
+            if filepath not in current:
+                del self._seen[filepath]
+        for filepath in list(self._pending):
+            if filepath not in current:
+                del self._pending[filepath]
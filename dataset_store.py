@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Cache files counted against the disk budget; lock files, markers of running
+# jobs and temporary files are left alone
+EVICTABLE_PREFIXES = ('dataset-', 'schema-', 'duplicates-')
+EVICTABLE_SUFFIXES = ('.pkl', '.json', '.json.failed')
+
+
+class DatasetStore:
+    """Content-addressed store of parsed datasets and their search indices
+
+    Datasets are keyed by the SHA-256 of the source file, so the same workbook
+    uploaded twice (or loaded from the data folder and uploaded) is parsed once.
+    Recently used datasets are kept in memory and all of them are pickled to
+    disk. The least recently used cache files (dataset pickles, schemas and
+    duplicate reports) are removed once they together exceed `max_disk_bytes`.
+    """
+
+    def __init__(self, cache_dir: str, max_in_memory: int = 2, max_disk_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_in_memory = max_in_memory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def save_upload(self, file_storage, upload_dir: str, extension: str) -> Tuple[str, str]:
+        """Stream an uploaded file to disk while hashing it
+
+        Returns the saved path and the content hash. The path is private to
+        this request, so concurrent uploads of the same workbook never share
+        (or delete) each other's file.
+        """
+        digest = hashlib.sha256()
+        request_id = f"{os.getpid()}-{threading.get_ident()}"
+        tmp_path = os.path.join(upload_dir, f".upload-{request_id}.part")
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = file_storage.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            # The caller only learns the final path, so a partial upload is removed here
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        content_hash = digest.hexdigest()
+        filepath = os.path.join(upload_dir, f"{content_hash}-{request_id}.{extension}")
+        os.replace(tmp_path, filepath)
+        return filepath, content_hash
+
+    def hash_file(self, filepath: str) -> str:
+        """Compute the content hash of a file already on disk"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _dataset_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"dataset-{content_hash}.pkl")
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Return a previously parsed dataset, from memory or disk"""
+        with self._lock:
+            if content_hash in self._memory:
+                self._memory.move_to_end(content_hash)
+                logging.info(f"Dataset {content_hash[:12]} found in memory")
+                return self._memory[content_hash]
+
+        path = self._dataset_path(content_hash)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                dataset = pickle.load(f)
+            # The modification time doubles as the last use for disk eviction
+            os.utime(path)
+        except Exception as e:
+            logging.warning(f"Could not read cached dataset {path}: {e}")
+            return None
+
+        logging.info(f"Dataset {content_hash[:12]} loaded from disk cache")
+        self._remember(content_hash, dataset)
+        return dataset
+
+    def contains(self, content_hash: str) -> bool:
+        """Check whether a dataset is stored without loading it"""
+        with self._lock:
+            if content_hash in self._memory:
+                return True
+        return os.path.exists(self._dataset_path(content_hash))
+
+    def put(self, content_hash: str, dataset: Dict[str, Any], remember: bool = True):
+        """Store a parsed dataset in memory and persist it to disk
+
+        Pass remember=False for datasets built ahead of time that should only
+        be written to disk, so they do not evict the ones currently in use.
+        """
+        if remember:
+            self._remember(content_hash, dataset)
+
+        path = self._dataset_path(content_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(dataset, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            logging.info(f"Dataset {content_hash[:12]} saved to {path}")
+        except Exception as e:
+            logging.warning(f"Could not save dataset {content_hash[:12]}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self._evict_disk(keep=path)
+
+    def _evict_disk(self, keep: str):
+        """Remove least recently used cache files until the cache fits `max_disk_bytes`"""
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.startswith(EVICTABLE_PREFIXES) and filename.endswith(EVICTABLE_SUFFIXES):
+                path = os.path.join(self.cache_dir, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # removed by another worker
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                logging.info(f"Evicted cache file {path} ({size / 1048576:.1f}MB)")
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _remember(self, content_hash: str, dataset: Dict[str, Any]):
+        with self._lock:
+            self._memory[content_hash] = dataset
+            self._memory.move_to_end(content_hash)
+            while len(self._memory) > self.max_in_memory:
+                self._memory.popitem(last=False)
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Duplicate and near-duplicate record detection
+Finds seat numbers used by more than one row and clusters of names that are
+probably the same student spelled differently. Names are only compared
+within blocks that share a phonetic key or a first/last word, and the
+blocks are compared on a process pool, so large files finish in minutes.
+
+Usage:
+    python duplicate_detection.py "data/نتيجة الثانوية 24.xlsx" report.json
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Tuple
+
+from phonetic import phonetic_keys
+
+SIMILARITY_THRESHOLD = 0.9
+MAX_BLOCK_SIZE = 200  # larger blocks are compared within a sliding window only
+WINDOW_SIZE = 20
+COMPARISONS_PER_TASK = 200000
+MAX_REPORT_ITEMS = 5000
+
+
+def _block_pairs(size: int):
+    """All pairs of a small block, or sliding-window pairs of a large sorted block"""
+    if size <= MAX_BLOCK_SIZE:
+        for i in range(size):
+            for j in range(i + 1, size):
+                yield i, j
+    else:
+        for i in range(size):
+            for j in range(i + 1, min(i + WINDOW_SIZE, size)):
+                yield i, j
+
+
+def _comparisons(size: int) -> int:
+    if size <= MAX_BLOCK_SIZE:
+        return size * (size - 1) // 2
+    return size * (WINDOW_SIZE - 1)
+
+
+def _words_close(words_a: List[str], words_b: List[str]) -> bool:
+    """At most one word differs, or one name is the other with a single word left out"""
+    if len(words_a) == len(words_b):
+        return sum(1 for a, b in zip(words_a, words_b) if a != b) <= 1
+    if abs(len(words_a) - len(words_b)) != 1:
+        return False
+    shorter, longer = sorted((words_a, words_b), key=len)
+    for i in range(len(longer)):
+        if longer[:i] + longer[i + 1:] == shorter:
+            return True
+    return False
+
+
+def compare_blocks(blocks: List[Tuple[str, List[Tuple[int, str]]]], threshold: float = SIMILARITY_THRESHOLD):
+    """Compare names inside each block, returning (position, position, similarity) matches
+
+    Runs in pool workers, so it only takes and returns plain tuples.
+    """
+    matches = []
+    for kind, block in blocks:
+        words = [name.split() for _, name in block]
+        for i, j in _block_pairs(len(block)):
+            position_a, name_a = block[i]
+            position_b, name_b = block[j]
+            if kind == 'p':
+                # Same phonetic skeleton: spelling may differ in every word
+                if abs(len(words[i]) - len(words[j])) > 1:
+                    continue
+            elif not _words_close(words[i], words[j]):
+                # Same first and last word: the rest must be nearly identical
+                continue
+            matcher = SequenceMatcher(None, name_a, name_b)
+            if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+                continue
+            similarity = matcher.ratio()
+            if similarity >= threshold:
+                matches.append((position_a, position_b, round(similarity, 3)))
+    return matches
+
+
+def build_blocks(names: List[str]) -> List[Tuple[str, List[Tuple[int, str]]]]:
+    """Group name positions that share a phonetic skeleton or their first and last word"""
+    blocks: Dict[str, List[int]] = {}
+    for position, name in enumerate(names):
+        words = name.split()
+        if not words:
+            continue
+        keys = phonetic_keys(name)
+        if keys:
+            blocks.setdefault('p:' + ' '.join(keys), []).append(position)
+        if len(words) > 1:
+            blocks.setdefault(f"w:{words[0]} {words[-1]}", []).append(position)
+
+    result = []
+    for key, positions in blocks.items():
+        if len(positions) > 1:
+            # Sorting keeps similar spellings next to each other for windowed blocks
+            result.append((key[0], sorted(((position, names[position]) for position in positions),
+                                          key=lambda item: item[1])))
+    return result
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+
+def find_duplicates(engine, processes: int = None, threshold: float = SIMILARITY_THRESHOLD) -> Dict[str, Any]:
+    """Build a duplicate report for a loaded ArabicSearchEngine"""
+    started = time.perf_counter()
+
+    def seat_numbers(rows):
+        if not engine.id_column:
+            return []
+        return [engine._format_value(engine.data[engine.id_column].iat[int(idx)]) for idx in rows]
+
+    # Seat numbers shared by several rows
+    duplicate_ids = []
+    for id_val, rows in engine.id_index.items():
+        if len(rows) > 1:
+            names = []
+            if engine.name_column:
+                names = [str(engine.data[engine.name_column].iat[int(idx)]) for idx in rows]
+            duplicate_ids.append({'id': id_val, 'rows': rows.tolist(), 'names': names})
+
+    # Near-duplicate names, compared only within blocks
+    names = list(engine.name_index)
+    blocks = build_blocks(names)
+
+    tasks = []
+    current, current_cost = [], 0
+    for block in blocks:
+        current.append(block)
+        current_cost += _comparisons(len(block[1]))
+        if current_cost >= COMPARISONS_PER_TASK:
+            tasks.append(current)
+            current, current_cost = [], 0
+    if current:
+        tasks.append(current)
+
+    matches = []
+    if len(tasks) > 1:
+        # spawn: the job is started from threaded web workers, where fork is unsafe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            for task_matches in pool.map(compare_blocks, tasks, [threshold] * len(tasks)):
+                matches.extend(task_matches)
+    else:
+        for task in tasks:
+            matches.extend(compare_blocks(task, threshold))
+
+    union_find = _UnionFind()
+    best_similarity = {}
+    for position_a, position_b, similarity in matches:
+        union_find.union(position_a, position_b)
+
+    clusters: Dict[int, List[int]] = {}
+    for position in list(union_find.parent):
+        clusters.setdefault(union_find.find(position), []).append(position)
+    for position_a, position_b, similarity in matches:
+        root = union_find.find(position_a)
+        best_similarity[root] = min(best_similarity.get(root, 1.0), similarity)
+
+    name_clusters = []
+    for root, positions in clusters.items():
+        rows = [int(idx) for position in positions for idx in engine.name_index.rows_at(position)]
+        name_clusters.append({
+            'names': [names[position] for position in positions],
+            'rows': rows,
+            'seat_numbers': seat_numbers(rows),
+            'similarity': best_similarity.get(root, 1.0),
+        })
+
+    # The same normalized name on several rows
+    for position, name in enumerate(names):
+        rows = engine.name_index.rows_at(position)
+        if len(rows) > 1 and position not in union_find.parent:
+            name_clusters.append({
+                'names': [name],
+                'rows': rows.tolist(),
+                'seat_numbers': seat_numbers(rows),
+                'similarity': 1.0,
+            })
+
+    name_clusters.sort(key=lambda cluster: (-cluster['similarity'], -len(cluster['rows'])))
+    elapsed = time.perf_counter() - started
+
+    logging.info(f"Duplicate detection: {len(duplicate_ids)} duplicate IDs, {len(name_clusters)} name clusters "
+                 f"from {len(blocks)} blocks in {elapsed:.1f}s")
+
+    return {
+        'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'total_records': len(engine.data),
+        'duplicate_id_count': len(duplicate_ids),
+        'name_cluster_count': len(name_clusters),
+        'duplicate_ids': duplicate_ids[:MAX_REPORT_ITEMS],
+        'name_clusters': name_clusters[:MAX_REPORT_ITEMS],
+        'stats': {
+            'distinct_names': len(names),
+            'blocks': len(blocks),
+            'comparisons': sum(_comparisons(len(block)) for _, block in blocks),
+            'tasks': len(tasks),
+            'seconds': round(elapsed, 2),
+        },
+    }
+
+
+def report_path(cache_dir: str, content_hash: str) -> str:
+    return os.path.join(cache_dir, f"duplicates-{content_hash}.json")
+
+
+def load_report(cache_dir: str, content_hash: str):
+    """Previously generated report for a dataset, or None"""
+    path = report_path(cache_dir, content_hash)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def report_status(cache_dir: str, content_hash: str, stale_after: float = 3600) -> Dict[str, Any]:
+    """'done', 'running', 'failed' (with the error) or 'missing' when no job will produce a report"""
+    path = report_path(cache_dir, content_hash)
+    if os.path.exists(path):
+        return {'status': 'done'}
+
+    marker = f"{path}.running"
+    if os.path.exists(marker) and not _marker_is_stale(marker, stale_after):
+        return {'status': 'running'}
+
+    failure = _recent_failure(f"{path}.failed", stale_after)
+    if failure is not None:
+        return dict(failure, status='failed')
+    return {'status': 'missing'}
+
+
+def _recent_failure(failed_path: str, stale_after: float):
+    """The recorded failure of the last run, unless it is old enough to retry"""
+    try:
+        if time.time() - os.path.getmtime(failed_path) > stale_after:
+            return None
+        with open(failed_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _marker_is_stale(marker: str, stale_after: float) -> bool:
+    """A marker left behind by a process that died or has been running too long"""
+    try:
+        with open(marker, 'r') as f:
+            pid = int(f.read().strip() or 0)
+        if time.time() - os.path.getmtime(marker) > stale_after:
+            return True
+    except (OSError, ValueError):
+        return False
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def write_report(cache_dir: str, content_hash: str, engine, stale_after: float = 3600):
+    """Generate and save the report unless another process is already doing it"""
+    path = report_path(cache_dir, content_hash)
+    if os.path.exists(path):
+        return
+
+    # A failed run is retried only after stale_after, not on every request
+    failed_path = f"{path}.failed"
+    if _recent_failure(failed_path, stale_after) is not None:
+        return
+
+    marker = f"{path}.running"
+    try:
+        if os.path.exists(marker) and _marker_is_stale(marker, stale_after):
+            os.remove(marker)
+        fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+    except FileNotFoundError:
+        # Another process removed the same stale marker first
+        return
+    except FileExistsError:
+        return
+
+    try:
+        report = find_duplicates(engine)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        if os.path.exists(failed_path):
+            os.remove(failed_path)
+    except Exception as e:
+        logging.error(f"Duplicate detection failed: {e}")
+        try:
+            with open(failed_path, 'w', encoding='utf-8') as f:
+                json.dump({'error': str(e), 'failed_at': time.strftime('%Y-%m-%d %H:%M:%S')}, f,
+                          ensure_ascii=False)
+        except OSError:
+            pass
+    finally:
+        if os.path.exists(marker):
+            os.remove(marker)
+
+
+if __name__ == "__main__":
+    from excel_processor import ExcelProcessor
+    from arabic_search import ArabicSearchEngine
+
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) < 2:
+        print("Usage: python duplicate_detection.py <results file> [report.json]")
+        sys.exit(1)
+
+    processor = ExcelProcessor()
+    data, columns = processor.load_excel(sys.argv[1])
+    if data is None:
+        print("Could not load file")
+        sys.exit(1)
+
+    report = find_duplicates(ArabicSearchEngine(data, columns, schema=processor.schema))
+    output = sys.argv[2] if len(sys.argv) > 2 else 'duplicates_report.json'
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"{report['duplicate_id_count']} duplicate IDs, {report['name_cluster_count']} name clusters. "
+          f"Report saved to: {output}")
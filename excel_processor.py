@@ -1,14 +1,38 @@
 import pandas as pd
+import numpy as np
 import logging
+import hashlib
+import json
 import re
 import os
 from typing import Tuple, Optional, List
 
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = 'string[pyarrow]'
+except ImportError:
+    TEXT_DTYPE = 'string'
+
+SCHEMA_VERSION = 3
+
+# Seat numbers and grades must round-trip to the exact text in the file, so
+# leading zeros and long digit runs keep the column as text. Decimal columns
+# written with a fixed number of decimals ("196.0", "187.8") record it in the
+# schema so they are displayed the same way.
+INT_PATTERN = r'0|-?[1-9]\d{0,17}'
+FLOAT32_PATTERN = r'-?(?:0|[1-9]\d{0,3})(?:\.\d{1,2})?'
+FLOAT_PATTERN = r'-?(?:0|[1-9]\d{0,14})(?:\.\d+)?'
+
+NAME_KEYWORDS = ['اسم', 'الاسم', 'الأسم', 'الإسم', 'name']
+ID_KEYWORDS = ['رقم الجلوس', 'رقم جلوس', 'جلوس', 'الرقم', 'رقم', 'id', 'number']
+
 class ExcelProcessor:
     """Handle Excel file processing and Arabic text normalization"""
     
-    def __init__(self):
+    def __init__(self, cache_dir: Optional[str] = None):
         self.arabic_columns = ['الاسم', 'رقم الجلوس', 'الأسم', 'الإسم', 'اسم', 'رقم جلوس']
+        self.cache_dir = cache_dir
+        self.schema = None
         
     def normalize_arabic_text(self, text):
         """Normalize Arabic text for consistent processing"""
@@ -28,50 +52,6 @@ class ExcelProcessor:
         
         return text
     
-    def detect_arabic_columns(self, df: pd.DataFrame) -> dict:
-        """Detect which columns contain Arabic text"""
-        column_mapping = {}
-        
-        for col in df.columns:
-            col_str = str(col).strip()
-            
-            # Check if column name contains Arabic
-            if self._contains_arabic(col_str):
-                # Try to identify the column type
-                if any(keyword in col_str for keyword in ['اسم', 'الاسم', 'الأسم', 'الإسم']):
-                    column_mapping['name'] = col
-                elif any(keyword in col_str for keyword in ['رقم الجلوس', 'رقم جلوس', 'الرقم']):
-                    column_mapping['id'] = col
-        
-        # If not found by name, try to detect by content
-        if 'name' not in column_mapping:
-            for col in df.columns:
-                # Check first few non-null values
-                sample_values = df[col].dropna().head(10)
-                if len(sample_values) > 0:
-                    arabic_count = sum(1 for val in sample_values if self._contains_arabic(str(val)))
-                    if arabic_count > len(sample_values) * 0.5:  # More than 50% contain Arabic
-                        column_mapping['name'] = col
-                        break
-        
-        # Try to detect ID column by numeric pattern
-        if 'id' not in column_mapping:
-            for col in df.columns:
-                sample_values = df[col].dropna().head(10)
-                if len(sample_values) > 0:
-                    numeric_count = 0
-                    for val in sample_values:
-                        try:
-                            float(val)
-                            numeric_count += 1
-                        except:
-                            pass
-                    if numeric_count > len(sample_values) * 0.8:  # More than 80% are numeric
-                        column_mapping['id'] = col
-                        break
-        
-        return column_mapping
-    
     def _contains_arabic(self, text: str) -> bool:
         """Check if text contains Arabic characters"""
         if not isinstance(text, str):
@@ -80,14 +60,18 @@ class ExcelProcessor:
         arabic_pattern = r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]'
         return bool(re.search(arabic_pattern, text))
     
-    def load_excel(self, filepath: str) -> Tuple[Optional[pd.DataFrame], List[str]]:
-        """Load and process Excel or CSV file with memory-efficient approach"""
+    def load_excel(self, filepath: str, content_hash: Optional[str] = None) -> Tuple[Optional[pd.DataFrame], List[str]]:
+        """Load and process Excel or CSV file with memory-efficient approach
+        
+        Pass the file's content hash when known so its cached schema is found
+        whatever the file is called (uploads get a new name every time).
+        """
         try:
             logging.info(f"Loading file: {filepath}")
             
             # Check if it's a CSV file
             if filepath.lower().endswith('.csv'):
-                return self._load_csv(filepath)
+                return self._load_csv(filepath, content_hash)
             
             # Get file size to determine approach for Excel files
             file_size = os.path.getsize(filepath)
@@ -147,26 +131,7 @@ class ExcelProcessor:
             
             logging.info(f"Loaded {len(df)} rows and {len(df.columns)} columns")
             
-            # Clean column names
-            df.columns = [str(col).strip() for col in df.columns]
-            
-            # Detect Arabic columns
-            column_mapping = self.detect_arabic_columns(df)
-            logging.info(f"Detected columns: {column_mapping}")
-            
-            # Normalize Arabic text in detected columns
-            for col_type, col_name in column_mapping.items():
-                if col_name in df.columns:
-                    if col_type == 'name':
-                        df[col_name] = df[col_name].apply(self.normalize_arabic_text)
-                    # Keep ID column as is for exact matching
-            
-            # Remove completely empty rows
-            df = df.dropna(how='all')
-            
-            # Reset index
-            df = df.reset_index(drop=True)
-            
+            df = self._prepare_dataframe(df, filepath, content_hash)
             columns = df.columns.tolist()
             
             logging.info(f"Processed {len(df)} rows successfully")
@@ -176,7 +141,7 @@ class ExcelProcessor:
             logging.error(f"Error loading Excel file: {str(e)}")
             return None, []
     
-    def _load_csv(self, filepath: str) -> Tuple[Optional[pd.DataFrame], List[str]]:
+    def _load_csv(self, filepath: str, content_hash: Optional[str] = None) -> Tuple[Optional[pd.DataFrame], List[str]]:
         """Load CSV file efficiently"""
         try:
             logging.info(f"Loading CSV file: {filepath}")
@@ -196,25 +161,7 @@ class ExcelProcessor:
             
             logging.info(f"Loaded {len(df)} rows and {len(df.columns)} columns from CSV")
             
-            # Clean column names
-            df.columns = [str(col).strip() for col in df.columns]
-            
-            # Detect Arabic columns
-            column_mapping = self.detect_arabic_columns(df)
-            logging.info(f"Detected columns: {column_mapping}")
-            
-            # Normalize Arabic text in detected columns
-            for col_type, col_name in column_mapping.items():
-                if col_name in df.columns:
-                    if col_type == 'name':
-                        df[col_name] = df[col_name].apply(self.normalize_arabic_text)
-            
-            # Remove completely empty rows
-            df = df.dropna(how='all')
-            
-            # Reset index
-            df = df.reset_index(drop=True)
-            
+            df = self._prepare_dataframe(df, filepath, content_hash)
             columns = df.columns.tolist()
             
             logging.info(f"Processed {len(df)} rows successfully from CSV")
@@ -224,6 +171,182 @@ class ExcelProcessor:
             logging.error(f"Error loading CSV file: {str(e)}")
             return None, []
     
+    def _prepare_dataframe(self, df: pd.DataFrame, filepath: str, content_hash: Optional[str] = None) -> pd.DataFrame:
+        """Clean, normalize and convert a freshly read all-string DataFrame to its schema"""
+        # Clean column names
+        df.columns = [str(col).strip() for col in df.columns]
+        
+        memory_before = df.memory_usage(deep=True).sum()
+        
+        # Reuse the schema inferred on a previous load of the same file
+        schema = self._load_cached_schema(filepath, content_hash)
+        if schema is None or list(schema['columns']) != df.columns.tolist():
+            schema = self.infer_schema(df)
+            self._save_cached_schema(filepath, schema, content_hash)
+        logging.info(f"Detected columns: {schema['roles']}")
+        
+        # Normalize Arabic text in the name column, keep ID column as is for exact matching
+        name_column = schema['roles'].get('name')
+        if name_column in df.columns:
+            df[name_column] = df[name_column].apply(self.normalize_arabic_text)
+        
+        try:
+            df = self.apply_schema(df, schema)
+        except (ValueError, TypeError) as e:
+            # A cached schema no longer matches the content, infer it again
+            logging.warning(f"Cached schema does not fit data ({e}), re-inferring")
+            schema = self.infer_schema(df)
+            self._save_cached_schema(filepath, schema, content_hash)
+            df = self.apply_schema(df, schema)
+        
+        self.schema = schema
+        
+        # Remove completely empty rows
+        df = df.dropna(how='all')
+        
+        # Reset index
+        df = df.reset_index(drop=True)
+        
+        memory_after = df.memory_usage(deep=True).sum()
+        logging.info(f"Memory usage: {memory_before / 1048576:.1f}MB -> {memory_after / 1048576:.1f}MB")
+        
+        return df
+    
+    def infer_schema(self, df: pd.DataFrame, sample_size: int = 200) -> dict:
+        """Infer a compact dtype and a search role for every column in one pass
+        
+        Integer columns get the smallest fitting integer type, short decimal
+        grades get float32, repeated text (school, status) becomes categorical
+        and the remaining text is stored as (Arrow-backed when available) strings.
+        """
+        columns = {}
+        arabic_ratio = {}
+        
+        for col in df.columns:
+            series = df[col].astype(str).str.strip()
+            values = series[series != '']
+            has_blanks = len(values) < len(series)
+            
+            sample = values.head(sample_size)
+            if len(sample) > 0:
+                arabic_ratio[col] = sum(1 for val in sample if self._contains_arabic(val)) / len(sample)
+            else:
+                arabic_ratio[col] = 0.0
+            
+            if values.empty:
+                columns[col] = {'kind': 'text', 'dtype': TEXT_DTYPE}
+            elif values.str.fullmatch(INT_PATTERN).all():
+                numbers = pd.to_numeric(values)
+                dtype = self._smallest_int_dtype(numbers.min(), numbers.max())
+                if has_blanks:
+                    dtype = dtype.capitalize()  # pandas nullable integer type
+                columns[col] = {'kind': 'int', 'dtype': dtype}
+            elif values.str.fullmatch(FLOAT32_PATTERN).all():
+                columns[col] = {'kind': 'float', 'dtype': 'float32', 'decimals': self._fixed_decimals(values)}
+            elif values.str.fullmatch(FLOAT_PATTERN).all():
+                columns[col] = {'kind': 'float', 'dtype': 'float64', 'decimals': self._fixed_decimals(values)}
+            elif values.nunique() <= len(series) * 0.5:
+                columns[col] = {'kind': 'category', 'dtype': 'category'}
+            else:
+                columns[col] = {'kind': 'text', 'dtype': TEXT_DTYPE}
+        
+        roles = {}
+        for col in df.columns:
+            col_str = str(col).strip().lower()
+            if 'name' not in roles and any(keyword in col_str for keyword in NAME_KEYWORDS):
+                roles['name'] = col
+            elif 'id' not in roles and any(keyword in col_str for keyword in ID_KEYWORDS):
+                roles['id'] = col
+        
+        # If not found by header, detect by content
+        if 'name' not in roles:
+            for col in df.columns:
+                if columns[col]['kind'] not in ('int', 'float') and arabic_ratio[col] > 0.5:
+                    roles['name'] = col
+                    break
+        
+        if 'id' not in roles:
+            for col in df.columns:
+                if col != roles.get('name') and columns[col]['kind'] == 'int':
+                    roles['id'] = col
+                    break
+        
+        # Names are searched as text and never treated as categories
+        if 'name' in roles:
+            columns[roles['name']] = {'kind': 'text', 'dtype': TEXT_DTYPE}
+        
+        return {'version': SCHEMA_VERSION, 'columns': columns, 'roles': roles}
+    
+    def _fixed_decimals(self, values: pd.Series) -> Optional[int]:
+        """Number of decimals when every value is written with the same count, else None"""
+        decimals = values.str.partition('.')[2].str.len().unique()
+        return int(decimals[0]) if len(decimals) == 1 else None
+    
+    def _smallest_int_dtype(self, min_value, max_value) -> str:
+        """Pick the narrowest numpy integer type holding the given range"""
+        for dtype in ('int8', 'int16', 'int32'):
+            info = np.iinfo(dtype)
+            if info.min <= min_value and max_value <= info.max:
+                return dtype
+        return 'int64'
+    
+    def apply_schema(self, df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+        """Convert all-string columns to the compact dtypes recorded in the schema"""
+        converted = {}
+        for col in df.columns:
+            spec = schema['columns'].get(col, {'kind': 'text', 'dtype': TEXT_DTYPE})
+            series = df[col]
+            
+            if spec['kind'] in ('int', 'float'):
+                series = series.astype(str).str.strip().replace('', None)
+                series = pd.to_numeric(series, errors='raise').astype(spec['dtype'])
+            elif spec['kind'] == 'category':
+                series = series.astype('category')
+            else:
+                series = series.astype(spec['dtype'])
+            converted[col] = series
+        
+        return pd.DataFrame(converted, index=df.index)
+    
+    def _schema_path(self, filepath: str, content_hash: Optional[str] = None) -> Optional[str]:
+        """Location of the cached schema for a file, keyed by its content hash or else its name, size and mtime"""
+        if not self.cache_dir:
+            return None
+        if content_hash:
+            return os.path.join(self.cache_dir, f"schema-{content_hash}.json")
+        stat = os.stat(filepath)
+        key = f"{os.path.basename(filepath)}:{stat.st_size}:{stat.st_mtime_ns}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"schema-{digest}.json")
+    
+    def _load_cached_schema(self, filepath: str, content_hash: Optional[str] = None) -> Optional[dict]:
+        """Load a previously inferred schema for this file if present"""
+        try:
+            path = self._schema_path(filepath, content_hash)
+            if not path or not os.path.exists(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                schema = json.load(f)
+            if schema.get('version') != SCHEMA_VERSION:
+                return None
+            logging.info(f"Using cached schema: {path}")
+            return schema
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read cached schema: {e}")
+            return None
+    
+    def _save_cached_schema(self, filepath: str, schema: dict, content_hash: Optional[str] = None):
+        """Persist the inferred schema next to the other per-file caches"""
+        try:
+            path = self._schema_path(filepath, content_hash)
+            if not path:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(schema, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not save schema: {e}")
+    
     def get_sample_data(self, df: pd.DataFrame, n: int = 5) -> List[dict]:
         """Get sample data for preview"""
         if df is None or df.empty:
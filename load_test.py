@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Load test for results-day traffic
+Boots the app against a synthetic results file and replays a mix of
+seat-number lookups, name searches with typos, pagination clicks and
+dataset reloads at a configurable concurrency, all on the local machine.
+
+Usage:
+    python load_test.py --rows 100000 --users 50 --duration 60
+    python load_test.py --server gunicorn --workers 4 --mix id=60,name=30,page=8,reload=2
+"""
+
+import argparse
+import csv
+import http.client
+import logging
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode
+
+FIRST_NAMES = ['محمد', 'أحمد', 'محمود', 'مصطفى', 'علي', 'عمر', 'يوسف', 'إبراهيم', 'خالد', 'حسن',
+               'حسين', 'عبد الله', 'عبد الرحمن', 'مؤمن', 'ياسر', 'فاطمة', 'مريم', 'سارة', 'آية',
+               'نور', 'هدى', 'أسماء', 'رحمة', 'شيماء', 'إسراء', 'زينب', 'رؤى', 'ملك', 'جنى']
+FAMILY_NAMES = ['محمد', 'أحمد', 'السيد', 'إبراهيم', 'عبد العزيز', 'الشافعي', 'عثمان', 'سليمان',
+                'رمضان', 'عطية', 'الجمال', 'النجار', 'منصور', 'عيسى', 'هاشم', 'شحاتة']
+SCHOOLS = ['مدرسة النور الثانوية', 'مدرسة الأمل الثانوية', 'مدرسة الفجر الثانوية',
+           'مدرسة السلام الثانوية', 'مدرسة طه حسين الثانوية', 'مدرسة الشهيد الثانوية']
+STATUSES = ['ناجح دور أول', 'ناجح دور أول', 'ناجح دور أول', 'دور ثان', 'راسب']
+SUBJECTS = ['العربي', 'الانجليزي', 'الرياضيات', 'الفيزياء', 'الكيمياء']
+FIRST_SEAT_NUMBER = 100000
+
+DEFAULT_MIX = 'id=55,name=30,page=12,reload=3'
+
+
+def generate_dataset(path: str, rows: int, seed: int = 42) -> List[Tuple[str, str]]:
+    """Write a synthetic results CSV and return its (seat number, name) pairs"""
+    rng = random.Random(seed)
+    students = []
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['رقم الجلوس', 'الاسم', 'المدرسة', 'الحالة'] + SUBJECTS + ['المجموع'])
+        for i in range(rows):
+            seat = str(FIRST_SEAT_NUMBER + i)
+            name = ' '.join([rng.choice(FIRST_NAMES), rng.choice(FIRST_NAMES),
+                             rng.choice(FIRST_NAMES), rng.choice(FAMILY_NAMES)])
+            grades = [rng.randint(20, 100) for _ in SUBJECTS]
+            writer.writerow([seat, name, rng.choice(SCHOOLS), rng.choice(STATUSES)] +
+                            grades + [f"{sum(grades) * 0.82:.1f}"])
+            students.append((seat, name))
+
+    print(f"Generated {rows:,} synthetic records in {path}")
+    return students
+
+
+def add_typo(name: str, rng: random.Random) -> str:
+    """Introduce the kinds of mistakes parents make when typing a name"""
+    words = name.split()
+    kind = rng.choice(['drop_letter', 'swap_letters', 'hamza', 'drop_word', 'none'])
+    position = rng.randrange(len(words))
+    word = words[position]
+
+    if kind == 'drop_letter' and len(word) > 3:
+        i = rng.randrange(len(word))
+        words[position] = word[:i] + word[i + 1:]
+    elif kind == 'swap_letters' and len(word) > 3:
+        i = rng.randrange(len(word) - 1)
+        words[position] = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    elif kind == 'hamza':
+        words[position] = word.replace('أ', 'ا').replace('إ', 'ا').replace('ة', 'ه').replace('ى', 'ي')
+    elif kind == 'drop_word' and len(words) > 2:
+        del words[-1]
+
+    return ' '.join(words)
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """Parse 'id=55,name=30,...' into action weights"""
+    weights = {}
+    for part in mix.split(','):
+        action, _, weight = part.partition('=')
+        action = action.strip()
+        if action not in ('id', 'name', 'page', 'reload'):
+            raise ValueError(f"Unknown action in mix: {action}")
+        weights[action] = int(weight)
+    return weights
+
+
+class LoadGenerator:
+    """Virtual users sending a weighted mix of requests to a running server"""
+
+    def __init__(self, host: str, port: int, students: List[Tuple[str, str]], data_filename: str,
+                 weights: Dict[str, int], timeout: float = 60.0, think_time: float = 0.0):
+        self.host = host
+        self.port = port
+        self.students = students
+        self.data_filename = data_filename
+        self.actions = list(weights)
+        self.weights = [weights[action] for action in self.actions]
+        self.timeout = timeout
+        self.think_time = think_time
+        self.samples = defaultdict(list)  # route -> [(latency, ok)]
+        self._lock = threading.Lock()
+
+    def _request(self, route: str, path: str, fields: Dict[str, str], expected: Tuple[int, ...]):
+        body = urlencode(fields)
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        started = time.perf_counter()
+        ok = False
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status in expected
+            finally:
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            ok = False
+        latency = time.perf_counter() - started
+
+        with self._lock:
+            self.samples[route].append((latency, ok))
+
+    def _one_action(self, rng: random.Random):
+        action = rng.choices(self.actions, self.weights)[0]
+
+        if action == 'id':
+            if rng.random() < 0.05:
+                seat = str(FIRST_SEAT_NUMBER + len(self.students) + rng.randint(1, 1000))  # unknown
+            else:
+                seat = rng.choice(self.students)[0]
+            self._request('search:id', '/search', {'search_type': 'id', 'query': seat}, (200,))
+        elif action == 'name':
+            name = rng.choice(self.students)[1]
+            if rng.random() < 0.5:
+                name = add_typo(name, rng)
+            self._request('search:name', '/search', {'search_type': 'name', 'query': name}, (200,))
+        elif action == 'page':
+            name = ' '.join(rng.choice(self.students)[1].split()[:2])
+            self._request('search:page', '/search',
+                          {'search_type': 'name', 'query': name, 'page': str(rng.randint(2, 5))}, (200,))
+        else:
+            self._request('load_data_file', '/load_data_file', {'filename': self.data_filename}, (302,))
+
+    def _user(self, seed: int, deadline: float):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            self._one_action(rng)
+            if self.think_time:
+                time.sleep(rng.uniform(0, 2 * self.think_time))
+
+    def run(self, users: int, duration: float, ramp_up: float = 0.0) -> float:
+        """Run all virtual users until the duration elapses, return the wall time"""
+        started = time.perf_counter()
+        deadline = started + duration
+        threads = []
+        for i in range(users):
+            thread = threading.Thread(target=self._user, args=(i, deadline), daemon=True)
+            thread.start()
+            threads.append(thread)
+            if ramp_up:
+                time.sleep(ramp_up / users)
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values), math.ceil(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[rank]
+
+
+def print_report(samples: Dict[str, List[Tuple[float, bool]]], elapsed: float):
+    """Print throughput, latency percentiles and error rate per route"""
+    header = f"{'route':<16}{'requests':>10}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>9}"
+    print(header)
+    print('-' * len(header))
+
+    everything = []
+    for route in sorted(samples):
+        everything.extend(samples[route])
+    rows = [(route, samples[route]) for route in sorted(samples)] + [('total', everything)]
+
+    for route, route_samples in rows:
+        latencies = sorted(latency * 1000 for latency, _ in route_samples)
+        errors = sum(1 for _, ok in route_samples if not ok)
+        count = len(route_samples)
+        print(f"{route:<16}{count:>10,}{count / elapsed:>9.1f}"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 90):>9.1f}"
+              f"{percentile(latencies, 99):>9.1f}{(latencies[-1] if latencies else 0):>9.1f}"
+              f"{(errors / count * 100 if count else 0):>8.1f}%")
+
+
+def wait_for_port(host: str, port: int, timeout: float) -> bool:
+    """Wait until something accepts connections on the port"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_inprocess_server(host: str, port: int):
+    """Serve the Flask app from a thread of this process"""
+    from werkzeug.serving import make_server
+    from app import app
+
+    # Keep per-request logging from drowning the report
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def start_gunicorn(host: str, port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    """Start gunicorn with the project configuration in a subprocess"""
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py',
+               '--bind', f'{host}:{port}', '--workers', str(workers),
+               '--log-level', 'warning', 'main:app']
+    return subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate results-day traffic against the search app')
+    parser.add_argument('--server', choices=['inprocess', 'gunicorn'], default='inprocess')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--rows', type=int, default=50000, help='synthetic records to generate')
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--ramp-up', type=float, default=0, help='seconds to start all users')
+    parser.add_argument('--think-time', type=float, default=0, help='mean pause between requests (s)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='action weights, e.g. ' + DEFAULT_MIX)
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    host = '127.0.0.1'
+
+    with tempfile.TemporaryDirectory(prefix='loadtest-') as data_dir:
+        data_filename = 'loadtest.csv'
+        students = generate_dataset(os.path.join(data_dir, data_filename), args.rows)
+
+        # The app reads these at import time: serve the synthetic file as the preloaded default,
+        # without background jobs competing with the measured requests
+        env = dict(os.environ, DATA_FOLDER=data_dir, DEFAULT_DATA_FILE=data_filename, DATA_WATCH_INTERVAL='0',
+                   DUPLICATE_REPORTS='0')
+
+        process = None
+        server = None
+        boot_started = time.perf_counter()
+        if args.server == 'gunicorn':
+            process = start_gunicorn(host, args.port, args.workers, env)
+        else:
+            os.environ.update(env)
+            server = start_inprocess_server(host, args.port)
+
+        try:
+            if not wait_for_port(host, args.port, args.startup_timeout):
+                print('Server did not start in time')
+                return 1
+            print(f"Server ({args.server}) ready in {time.perf_counter() - boot_started:.1f}s, "
+                         f"running {args.users} users for {args.duration:g}s")
+
+            generator = LoadGenerator(host, args.port, students, data_filename, weights,
+                                      think_time=args.think_time)
+            elapsed = generator.run(args.users, args.duration, args.ramp_up)
+            print_report(generator.samples, elapsed)
+        finally:
+            if process:
+                process.terminate()
+                process.wait(timeout=30)
+            if server:
+                server.shutdown()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
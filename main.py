@@ -1,4 +1,8 @@
-from app import app
+# The duplicate job's spawn pool re-imports this module as __mp_main__; its
+# processes only compare names, so they skip importing (and preloading) the app
+if __name__ != '__mp_main__':
+    from app import app, start_background_jobs
 
 if __name__ == '__main__':
+    start_background_jobs()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,191 @@
+import logging
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from compact_index import CompactIndex
+
+# Arabic letters mapped to consonant classes. Long vowels, hamza carriers and
+# ain are dropped because Latin spellings of names rarely write them
+# consistently ("Ali" for علي, "Ahmed" for أحمد, "Yousef" for يوسف).
+ARABIC_CLASSES = {
+    'ب': 'b', 'ت': 't', 'ط': 't', 'ث': 's', 'س': 's', 'ص': 's',
+    'ج': 'j', 'ح': 'h', 'ه': 'h', 'خ': 'K', 'د': 'd', 'ض': 'd',
+    'ذ': 'z', 'ز': 'z', 'ظ': 'z', 'ر': 'r', 'ش': 'S', 'غ': 'G',
+    'ف': 'f', 'ق': 'k', 'ك': 'k', 'ل': 'l', 'م': 'm', 'ن': 'n',
+}
+
+# Latin spellings mapped into the same classes, digraphs first. Egyptian
+# spellings write ج as "g" and ث as "th"/"s", so both land on the Arabic class.
+LATIN_DIGRAPHS = [('sh', 'S'), ('ch', 'S'), ('kh', 'K'), ('gh', 'G'), ('th', 's'),
+                  ('dh', 'z'), ('ph', 'f'), ('ck', 'k')]
+LATIN_CLASSES = {
+    'b': 'b', 'p': 'b', 't': 't', 'd': 'd', 'z': 'z', 'r': 'r', 's': 's',
+    'c': 'k', 'k': 'k', 'q': 'k', 'f': 'f', 'v': 'f', 'j': 'j', 'g': 'j',
+    'h': 'h', 'l': 'l', 'm': 'm', 'n': 'n', 'x': 'ks',
+}
+
+LATIN_PATTERN = re.compile(r'[a-zA-Z]')
+ARABIC_DIACRITICS = re.compile(r'[\u064B-\u0652\u0640]')
+
+
+def contains_latin(text: str) -> bool:
+    """Check if text contains Latin letters"""
+    return bool(LATIN_PATTERN.search(text or ''))
+
+
+def _finish_key(classes: List[str]) -> str:
+    """Collapse doubled consonants and drop a trailing h after two or more consonants"""
+    key = []
+    for cls in classes:
+        if not key or key[-1] != cls:
+            key.append(cls)
+    # Final ة/ه/ح and a final written "h" ("Fatmah", "Abdullah", "Saleh") are unreliable
+    if len(key) > 2 and key[-1] == 'h':
+        key.pop()
+    return ''.join(key)
+
+
+def _split_arabic_words(text: str) -> List[str]:
+    text = ARABIC_DIACRITICS.sub('', text)
+    text = re.sub(r'عبد\s*ال', 'عبد ال', text)
+    words = []
+    for word in text.split():
+        if word.startswith('ال') and len(word) > 3:
+            word = word[2:]
+        words.append(word)
+    return words
+
+
+def _split_latin_words(text: str) -> List[str]:
+    words = []
+    for word in re.split(r'[^a-z]+', text.lower()):
+        if not word:
+            continue
+        # "Abdelrahman", "Abdul Aziz", "Abdallah"
+        match = re.match(r'^(abd)(?:[aeiou]l)?(.+)?$', word)
+        if match:
+            words.append('abd')
+            word = match.group(2) or ''
+        elif re.match(r'^[ae]l.{3,}$', word):
+            # "Elsayed", "Al-Masry" written as one word
+            word = word[2:]
+        elif word in ('el', 'al'):
+            continue
+        if word:
+            words.append(word)
+    return words
+
+
+def arabic_word_key(word: str) -> str:
+    """Consonant skeleton of a single Arabic word"""
+    return _finish_key([ARABIC_CLASSES[ch] for ch in word if ch in ARABIC_CLASSES])
+
+
+def latin_word_key(word: str) -> str:
+    """Transliterate a single Latin word into the Arabic consonant key space"""
+    classes = []
+    i = 0
+    while i < len(word):
+        pair = word[i:i + 2]
+        for digraph, cls in LATIN_DIGRAPHS:
+            if pair == digraph:
+                classes.append(cls)
+                i += 2
+                break
+        else:
+            cls = LATIN_CLASSES.get(word[i])
+            if cls:
+                classes.extend(cls)
+            i += 1
+    return _finish_key(classes)
+
+
+def phonetic_keys(text: str) -> List[str]:
+    """Per-word phonetic keys for Arabic or Latin text, skipping words without consonants"""
+    if not text:
+        return []
+    if contains_latin(text):
+        keys = [latin_word_key(word) for word in _split_latin_words(text)]
+    else:
+        keys = [arabic_word_key(word) for word in _split_arabic_words(text)]
+    return [key for key in keys if key]
+
+
+class PhoneticIndex:
+    """Phonetic word key -> names index for cross-script and sound-alike search
+
+    Keys are computed once per distinct name at build time. A query is turned
+    into the same keys, so matching names come from a few hash-style lookups
+    instead of a similarity scan over every name.
+    """
+
+    def __init__(self, name_index):
+        self.name_index = name_index
+
+        postings: Dict[str, List[int]] = {}
+        first_keys: Dict[str, List[int]] = {}
+        sequences = []
+        for position, name in enumerate(name_index):
+            keys = phonetic_keys(name)
+            for key in set(keys):
+                postings.setdefault(key, []).append(position)
+            if keys:
+                first_keys.setdefault(keys[0], []).append(position)
+            sequences.append(' '.join(keys).encode('utf-8'))
+        self.keys = CompactIndex.from_dict(postings)
+        # Names by the key of their first word, to rank names starting with the query first
+        self.first_keys = CompactIndex.from_dict(first_keys)
+
+        # Every name's keys in order, as one blob indexed by name position
+        sequence_lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64,
+                                       count=len(sequences))
+        self.sequence_offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum(sequence_lengths, out=self.sequence_offsets[1:])
+        self.sequence_blob = np.frombuffer(b''.join(sequences), dtype=np.uint8).copy()
+
+        nbytes = (self.keys.nbytes + self.first_keys.nbytes +
+                  self.sequence_offsets.nbytes + self.sequence_blob.nbytes)
+        logging.info(f"Phonetic index ready: {len(self.keys)} keys, {nbytes / 1048576:.1f}MB")
+
+    def search(self, query: str, max_candidates: int = 2000) -> List[Tuple[int, float]]:
+        """Name positions matching the query phonetically, as (position, score) best first"""
+        query_keys = phonetic_keys(query)
+        if not query_keys:
+            return []
+
+        postings = [self.keys.get(key) for key in dict.fromkeys(query_keys)]
+        postings = [positions for positions in postings if positions is not None]
+        if not postings:
+            return []
+
+        # Count how many query words each name matches; among equal counts, names
+        # starting with the first query word come first so they survive the cut
+        positions, counts = np.unique(np.concatenate(postings), return_counts=True)
+        first_positions = self.first_keys.get(query_keys[0])
+        if first_positions is not None:
+            starts = np.isin(positions, first_positions, assume_unique=True)
+            order = np.lexsort((~starts, -counts))[:max_candidates]
+        else:
+            order = np.argsort(-counts, kind='stable')[:max_candidates]
+
+        distinct_keys = len(dict.fromkeys(query_keys))
+        query_sequence = ' '.join(query_keys).encode('utf-8')
+        blob = memoryview(self.sequence_blob)
+        candidates = positions[order]
+        starts = self.sequence_offsets[candidates].tolist()
+        ends = self.sequence_offsets[candidates + 1].tolist()
+
+        results = []
+        for position, count, start, end in zip(candidates.tolist(), counts[order].tolist(), starts, ends):
+            score = 0.85 * count / distinct_keys
+            # Small bonus when the name starts with the query words in order
+            name_sequence = blob[start:end]
+            if name_sequence[:len(query_sequence)] == query_sequence and \
+                    (end - start == len(query_sequence) or name_sequence[len(query_sequence)] == ord(' ')):
+                score += 0.05
+            results.append((position, score))
+
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results
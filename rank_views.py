@@ -0,0 +1,135 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Columns whose values group students for per-school / per-region rankings
+FACET_KEYWORDS = ['مدرسة', 'المدرسة', 'school', 'محافظة', 'المحافظة', 'governorate',
+                  'إدارة', 'ادارة', 'الإدارة', 'الادارة', 'region']
+
+
+class RankView:
+    """Students ordered by one numeric column, nationally and within each facet value
+
+    Built once at load time: a descending permutation of the rows that have a
+    value plus the matching sorted (negated) values. Top-N is then a slice of
+    the permutation and a rank or percentile is a binary search.
+    """
+
+    def __init__(self, values: np.ndarray, facets: Dict[str, dict], dtype=np.float64):
+        valid_rows = np.flatnonzero(~np.isnan(values))
+        negated = (-values[valid_rows]).astype(dtype)
+
+        order = np.argsort(negated, kind='stable')
+        self.order = valid_rows[order].astype(np.int32)
+        self.sorted_negated = negated[order]
+
+        # One permutation per facet column: sorted by facet code, then by value.
+        # The categories and per-row codes are shared by all views of a dataset.
+        self.facets = {}
+        for column, facet in facets.items():
+            codes = facet['codes'][valid_rows]
+            facet_order = np.lexsort((negated, codes))
+            facet_codes = codes[facet_order]
+            offsets = np.searchsorted(facet_codes, np.arange(len(facet['categories']) + 1))
+            self.facets[column] = {
+                'categories': facet['categories'],
+                'codes': facet['codes'],
+                'order': valid_rows[facet_order].astype(np.int32),
+                'sorted_negated': negated[facet_order],
+                'offsets': offsets.astype(np.int64),
+            }
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by this view, not counting the shared facet codes"""
+        total = self.order.nbytes + self.sorted_negated.nbytes
+        for facet in self.facets.values():
+            total += facet['order'].nbytes + facet['sorted_negated'].nbytes + facet['offsets'].nbytes
+        return total
+
+    def _slice(self, facet_column: Optional[str], facet_value=None, facet_code: Optional[int] = None):
+        """Permutation and sorted values for the whole file or a single facet value"""
+        if facet_column is None:
+            return self.order, self.sorted_negated
+        facet = self.facets[facet_column]
+        if facet_code is None:
+            if facet_value not in facet['categories']:
+                return self.order[:0], self.sorted_negated[:0]
+            facet_code = facet['categories'].index(facet_value)
+        if facet_code < 0:
+            return self.order[:0], self.sorted_negated[:0]
+        start, end = facet['offsets'][facet_code], facet['offsets'][facet_code + 1]
+        return facet['order'][start:end], facet['sorted_negated'][start:end]
+
+    def top(self, n: int, facet_column: Optional[str] = None, facet_value=None) -> np.ndarray:
+        """Row numbers of the n highest values"""
+        order, _ = self._slice(facet_column, facet_value)
+        return order[:n]
+
+    def rank(self, value: float, facet_column: Optional[str] = None, row: Optional[int] = None) -> dict:
+        """Competition rank (1 + number strictly higher) and percentile for a value"""
+        facet_code = None
+        if facet_column is not None:
+            facet_code = int(self.facets[facet_column]['codes'][row])
+        _, sorted_negated = self._slice(facet_column, facet_code=facet_code)
+
+        total = len(sorted_negated)
+        # Search in the stored precision so a value always finds its own entries
+        target = sorted_negated.dtype.type(-value)
+        higher = int(np.searchsorted(sorted_negated, target, side='left'))
+        at_or_higher = int(np.searchsorted(sorted_negated, target, side='right'))
+        lower = total - at_or_higher
+        return {
+            'rank': higher + 1,
+            'total': total,
+            'percentile': round(lower / total * 100, 2) if total else 0.0,
+        }
+
+
+class RankViews:
+    """Rank views for every numeric column of a dataset, keyed by column name"""
+
+    def __init__(self, data: pd.DataFrame, exclude: Optional[List[str]] = None):
+        exclude = set(exclude or [])
+
+        facets = {}
+        for column in data.columns:
+            if isinstance(data[column].dtype, pd.CategoricalDtype) and \
+                    any(keyword in str(column).lower() for keyword in FACET_KEYWORDS):
+                categorical = data[column].array
+                facets[column] = {
+                    'categories': list(categorical.categories),
+                    'codes': np.asarray(categorical.codes).astype(np.int32),
+                }
+        self.facet_columns = list(facets)
+
+        self.views = {}
+        for column in data.columns:
+            if column in exclude or not pd.api.types.is_numeric_dtype(data[column].dtype):
+                continue
+            values = data[column].to_numpy(dtype='float64', na_value=np.nan)
+            if np.isnan(values).all():
+                continue
+            self.views[column] = RankView(values, facets, self._view_dtype(data[column].dtype, values))
+
+        total = (sum(view.nbytes for view in self.views.values()) +
+                 sum(facet['codes'].nbytes for facet in facets.values()))
+        logging.info(f"Rank views ready: {list(self.views)} by {self.facet_columns or 'nothing'}, "
+                     f"{total / 1048576:.1f}MB")
+
+    @staticmethod
+    def _view_dtype(column_dtype, values: np.ndarray):
+        """float32 for float32 columns and small integers, where it is exact; else float64"""
+        if column_dtype == np.float32:
+            return np.float32
+        if pd.api.types.is_integer_dtype(column_dtype) and np.nanmax(np.abs(values), initial=0) < 2 ** 24:
+            return np.float32
+        return np.float64
+
+    def __contains__(self, column: str) -> bool:
+        return column in self.views
+
+    def __getitem__(self, column: str) -> RankView:
+        return self.views[column]
@@ -0,0 +1,152 @@
+import logging
+from typing import Dict, List, Set, Tuple
+
+from compact_index import CompactIndex
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Damerau-Levenshtein (optimal string alignment) distance, capped at max_distance + 1"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+
+    return min(previous[-1], max_distance + 1)
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """All strings obtained by deleting up to `distance` characters from word"""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        next_frontier = set()
+        for item in frontier:
+            if len(item) <= 1:
+                continue
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+class SpellCorrector:
+    """Word-level typo correction for names using a precomputed deletion index (SymSpell)
+
+    Every known word is indexed under each string obtained by deleting up to
+    `max_distance` of its letters. A query word is looked up the same way, so
+    all known words within the edit distance are found by a handful of exact
+    lookups instead of comparing the query with the whole vocabulary.
+
+    Both the vocabulary and the deletion index are CompactIndex buffers, so
+    they stay shared between forked workers like the name index.
+    """
+
+    def __init__(self, name_index, max_distance: int = 2):
+        self.max_distance = max_distance
+
+        frequencies: Dict[str, int] = {}
+        for name, rows in name_index.items():
+            for word in name.split():
+                frequencies[word] = frequencies.get(word, 0) + len(rows)
+
+        # Vocabulary: word -> [frequency]; a word's id is its sorted position
+        self.words = CompactIndex.from_dict({word: [count] for word, count in frequencies.items()})
+        # All words in one string, so "is this part of a known word" is a single substring search
+        self.vocabulary_text = '\n'.join(self.words)
+
+        deletes: Dict[str, List[int]] = {}
+        for position, word in enumerate(self.words):
+            for deleted in _deletes(word, self._allowed_distance(word)):
+                deletes.setdefault(deleted, []).append(position)
+        self.deletes = CompactIndex.from_dict(deletes)
+
+        logging.info(f"Spell corrector ready: {len(self.words)} words, {len(self.deletes)} deletes, "
+                     f"{(self.words.nbytes + self.deletes.nbytes) / 1048576:.1f}MB")
+
+    def _allowed_distance(self, word: str) -> int:
+        """Short words tolerate fewer edits, otherwise everything corrects to everything"""
+        if len(word) <= 2:
+            return 0
+        if len(word) <= 4:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def is_known(self, word: str) -> bool:
+        """A known word or part of one; partial words typed on purpose are never corrected"""
+        return word in self.words or word in self.vocabulary_text
+
+    def lookup(self, word: str, limit: int = 5) -> List[Tuple[str, int, int]]:
+        """Known words close to `word` as (word, distance, frequency), best first"""
+        if word in self.words:
+            return [(word, 0, int(self.words[word][0]))]
+
+        max_distance = self._allowed_distance(word)
+        if max_distance == 0:
+            return []
+
+        candidates = set()
+        for deleted in _deletes(word, max_distance):
+            positions = self.deletes.get(deleted)
+            if positions is not None:
+                candidates.update(positions.tolist())
+
+        suggestions = []
+        for position in candidates:
+            candidate = self.words.key_at(position)
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                frequency = int(self.words.rows_at(position)[0])
+                suggestions.append((candidate, distance, frequency))
+
+        suggestions.sort(key=lambda item: (item[1], -item[2], item[0]))
+        return suggestions[:limit]
+
+    def correct_word(self, word: str) -> str:
+        """Closest known word, or the word itself when it is known or nothing is close enough"""
+        if self.is_known(word):
+            return word
+        suggestions = self.lookup(word, limit=1)
+        return suggestions[0][0] if suggestions else word
+
+    def correct(self, words: List[str]) -> List[str]:
+        """Rewrite every word of a normalized query to its closest known word"""
+        return [self.correct_word(word) for word in words]
+
+    def suggest(self, words: List[str], limit: int = 3) -> List[str]:
+        """Alternative full queries ("did you mean") built from the closest words"""
+        options = [self.lookup(word, limit=limit) or [(word, 0, 0)] for word in words]
+        best = [choices[0][0] for choices in options]
+
+        suggestions = []
+        if best != words:
+            suggestions.append(' '.join(best))
+
+        # Vary one word at a time, preferring the words with the closest alternatives
+        alternatives = []
+        for i, choices in enumerate(options):
+            for candidate, distance, frequency in choices[1:]:
+                alternatives.append((distance, -frequency, i, candidate))
+        for distance, _, i, candidate in sorted(alternatives):
+            variant = best[:i] + [candidate] + best[i + 1:]
+            text = ' '.join(variant)
+            if variant != words and text not in suggestions:
+                suggestions.append(text)
+            if len(suggestions) >= limit:
+                break
+
+        return suggestions[:limit]
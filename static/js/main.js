@@ -151,6 +151,8 @@ function updateSearchPlaceholder() {
     if (queryInput && selectedType) {
         if (selectedType.value === 'name') {
             queryInput.placeholder = 'أدخل جزء من الاسم...';
+        } else if (selectedType.value === 'column') {
+            queryInput.placeholder = 'أدخل القيمة المطلوبة...';
         } else {
             queryInput.placeholder = 'أدخل رقم الجلوس...';
         }
@@ -164,6 +166,8 @@ function updateSearchHelp() {
     if (searchHelpText && selectedType) {
         if (selectedType.value === 'name') {
             searchHelpText.textContent = 'البحث الذكي يجد النتائج المشابهة حتى مع الاختلافات البسيطة';
+        } else if (selectedType.value === 'column') {
+            searchHelpText.textContent = 'البحث في العمود المختار بالقيمة الكاملة أو بكلمات منها';
         } else {
             searchHelpText.textContent = 'البحث برقم الجلوس يجد المطابقة الدقيقة أو الجزئية';
         }
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from arabic_search import ArabicSearchEngine
+from excel_processor import ExcelProcessor
+
+
+def test_infer_schema_types_decimal_columns():
+    df = pd.DataFrame({
+        'رقم الجلوس': ['100001', '100002', '100003'],
+        'الاسم': ['محمد احمد', 'محمود علي', 'احمد حسن'],
+        'المجموع': ['196.0', '187.8', '150.5'],
+        'النسبة': ['47.80487804878049', '45.85365853658537', '36.707317073170735'],
+        'الدرجة': ['97.5', '80', '60.25'],
+    })
+    schema = ExcelProcessor().infer_schema(df)
+    columns = schema['columns']
+
+    assert columns['المجموع'] == {'kind': 'float', 'dtype': 'float32', 'decimals': 1}
+    assert columns['النسبة'] == {'kind': 'float', 'dtype': 'float64', 'decimals': None}
+    assert columns['الدرجة'] == {'kind': 'float', 'dtype': 'float32', 'decimals': None}
+    assert schema['roles'] == {'id': 'رقم الجلوس', 'name': 'الاسم'}
+
+
+def test_decimal_columns_display_as_written_and_rank(tmp_path):
+    path = tmp_path / 'results.csv'
+    path.write_text('رقم الجلوس,الاسم,المجموع,النسبة\n'
+                    '100001,محمد احمد,196.0,47.80487804878049\n'
+                    '100002,محمود علي,187.8,45.85365853658537\n'
+                    '100003,احمد حسن,201.5,49.146341463414636\n', encoding='utf-8')
+
+    processor = ExcelProcessor()
+    data, columns = processor.load_excel(str(path))
+    engine = ArabicSearchEngine(data, columns, schema=processor.schema)
+
+    row = engine.search_by_id('100001')[0]
+    assert row['المجموع'] == '196.0'
+    assert row['النسبة'] == '47.80487804878049'
+
+    top = engine.top_students('المجموع', n=2)
+    assert [student['رقم الجلوس'] for student in top] == [100003, 100001]
+    assert engine.search_by_column('النسبة', '45.85365853658537')[0]['رقم الجلوس'] == 100002
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from rank_views import RankViews
+
+
+def test_rank_float64_column():
+    data = pd.DataFrame({'المجموع': pd.Series([97.333, 97.334, 97.3331, 50.1, 97.333], dtype='float64')})
+    view = RankViews(data)['المجموع']
+
+    assert view.sorted_negated.dtype == np.float64
+    assert view.rank(97.334) == {'rank': 1, 'total': 5, 'percentile': 80.0}
+    assert view.rank(97.3331)['rank'] == 2
+    assert view.rank(97.333) == {'rank': 3, 'total': 5, 'percentile': 20.0}
+    assert view.rank(50.1) == {'rank': 5, 'total': 5, 'percentile': 0.0}
+    assert view.top(2).tolist() == [1, 2]
+
+
+def test_rank_float32_and_integer_columns_stay_narrow():
+    data = pd.DataFrame({
+        'الدرجة': pd.Series([10.5, 20.25, 20.25, 5.0], dtype='float32'),
+        'الترتيب': pd.Series([3, 1, 2, 4], dtype='int16'),
+    })
+    views = RankViews(data)
+
+    assert views['الدرجة'].sorted_negated.dtype == np.float32
+    assert views['الدرجة'].rank(20.25) == {'rank': 1, 'total': 4, 'percentile': 50.0}
+    assert views['الترتيب'].sorted_negated.dtype == np.float32
+    assert views['الترتيب'].rank(2)['rank'] == 3
+
+
+def test_facet_codes_are_shared_between_views():
+    data = pd.DataFrame({
+        'المدرسة': pd.Categorical(['أ', 'ب', 'أ', 'ب']),
+        'العربي': pd.Series([50, 40, 45, 48], dtype='int16'),
+        'المجموع': pd.Series([300.5, 280.0, 310.25, 250.75], dtype='float32'),
+    })
+    views = RankViews(data)
+
+    assert views['العربي'].facets['المدرسة']['codes'] is views['المجموع'].facets['المدرسة']['codes']
+    assert views['العربي'].top(2, 'المدرسة', 'ب').tolist() == [3, 1]
+    assert views['المجموع'].rank(250.75, 'المدرسة', row=3) == {'rank': 2, 'total': 2, 'percentile': 0.0}